@@ -0,0 +1,154 @@
+import math
+import os
+import threading
+
+import numpy as np
+
+from zonestore import ZoneStore
+
+
+# Window resolutions maintained per zone: (name, duration s, hop s, windows kept).
+# hop None is a tumbling window whose closed windows are kept in a history store;
+# a sliding window is served as the zone's trailing value only.
+WINDOWS = (
+    ("1m", 60.0, None, int(os.getenv("GRIDAI_AGG_1M_WINDOWS", "360"))),
+    ("5m", 300.0, None, int(os.getenv("GRIDAI_AGG_5M_WINDOWS", "288"))),
+    ("15m", 900.0, None, int(os.getenv("GRIDAI_AGG_15M_WINDOWS", "672"))),
+    ("rolling_5m", 300.0, 60.0, 0),
+)
+RESOLUTIONS = tuple(name for name, _, hop, _ in WINDOWS if hop is None)
+
+FIELDS = ("grid_load", "solar_generation")
+STATS = ("avg", "min", "max", "p95")
+# Columns of each window row (and of the per-resolution history stores)
+AGG_METRICS = tuple(f"{field}_{stat}" for field in FIELDS for stat in STATS) + ("count",)
+
+# p95 comes from a log-spaced histogram kept in the reducer state: bin k covers
+# [BIN_EDGES[k-1], BIN_EDGES[k]), about 2.4% wide; values below 1 share bin 0
+BIN_EDGES = np.geomspace(1.0, 1e5, 241)
+
+
+def combine_values(state, rows):
+    """
+    stateful_many combiner for one column of a window: state is
+    (count, sum, min, max, histogram). Each batch of readings is folded in
+    with one searchsorted + bincount; retractions are not expected (the
+    input is append-only). Identical values arrive as one row with a
+    multiplicity, so every row is weighted by its count.
+    """
+    added = [(row[0], count) for row, count in rows if count > 0]
+    if state is None:
+        state = (0, 0.0, math.inf, -math.inf, np.zeros(len(BIN_EDGES) + 1, dtype=np.int64))
+    if not added:
+        return state
+    values = np.array([value for value, _ in added], dtype=np.float64)
+    counts = np.array([count for _, count in added], dtype=np.int64)
+    n, total, low, high, hist = state
+    bins = np.searchsorted(BIN_EDGES, values, side="right")
+    # A new array rather than += : the previous state may still be referenced downstream
+    hist = hist + np.bincount(bins, weights=counts, minlength=len(hist)).astype(np.int64)
+    return (n + int(counts.sum()), total + float(values @ counts),
+            min(low, float(values.min())), max(high, float(values.max())), hist)
+
+
+def _quantile(state, q):
+    n, _, low, high, hist = state
+    cumulative = np.cumsum(hist)
+    rank = q * n
+    k = int(np.searchsorted(cumulative, rank, side="left"))
+    if k == 0 or k > len(BIN_EDGES) - 1:
+        return low if k == 0 else high
+    # Interpolate geometrically within the bin by rank
+    below = cumulative[k] - hist[k]
+    fraction = (rank - below) / hist[k]
+    value = BIN_EDGES[k - 1] * (BIN_EDGES[k] / BIN_EDGES[k - 1]) ** fraction
+    return min(max(float(value), low), high)
+
+
+def summarize(state, prefix):
+    """Window stats of one column as {prefix_avg, prefix_min, prefix_max, prefix_p95}."""
+    if state is None or not state[0]:
+        return {f"{prefix}_{stat}": None for stat in STATS}
+    n, total, low, high, _ = state
+    return {
+        f"{prefix}_avg": round(total / n, 2),
+        f"{prefix}_min": round(low, 2),
+        f"{prefix}_max": round(high, 2),
+        f"{prefix}_p95": round(_quantile(state, 0.95), 2),
+    }
+
+
+class WindowAggregates:
+    """
+    Per-zone windowed stats fed by the Pathway window reductions.
+
+    Each tumbling resolution has its own ZoneStore over AGG_METRICS with one
+    entry per window, keyed by window start; a window re-emitted as more
+    readings arrive replaces its entry. latest(zone) holds the zone's
+    current window per resolution and is replaced, never mutated, so
+    snapshots can share it.
+    """
+
+    def __init__(self, windows=WINDOWS, max_zones=10000):
+        self.windows = {name: (duration, hop) for name, duration, hop, _ in windows}
+        self.stores = {
+            name: ZoneStore(capacity=keep, max_zones=max_zones, metrics=AGG_METRICS)
+            for name, _, hop, keep in windows if hop is None
+        }
+        self.max_zones = max_zones
+        self._latest = {}    # zone -> {window name: row}
+        self._newest = {}    # zone -> newest reading ts seen in any window
+        self._lock = threading.Lock()
+
+    def observe(self, name, zone, start, end, load_state, solar_state):
+        """Folds one emitted window (reducer states for grid load and solar) into the stores."""
+        row = {**summarize(load_state, "grid_load"), **summarize(solar_state, "solar_generation")}
+        row["count"] = load_state[0] if load_state is not None else 0
+        row["start"], row["end"] = start, end
+
+        store = self.stores.get(name)
+        if store is not None and not store.upsert(zone, start, row):
+            return
+        with self._lock:
+            current = self._latest.get(zone)
+            if current is None and len(self._latest) >= self.max_zones:
+                return
+            current = current or {}
+            previous = current.get(name)
+            if self.windows[name][1] is None:
+                if previous is not None and start < previous["start"]:
+                    return
+            elif not self._trailing(zone, row, previous):
+                return
+            self._latest[zone] = {**current, name: row}
+
+    def _trailing(self, zone, row, previous):
+        # Of the overlapping sliding windows, serve the one that ends soonest
+        # after the zone's newest reading: the trailing duration up to now
+        newest = max(self._newest.get(zone, -math.inf), row["start"])
+        self._newest[zone] = newest
+        if previous is None or previous["end"] <= newest:
+            return True
+        return row["end"] <= previous["end"]
+
+    def latest(self, zone=None):
+        """Current window per resolution for zone, or {zone: ...} for every zone."""
+        if zone is not None:
+            return self._latest.get(zone)
+        return dict(self._latest)
+
+    def value(self, zone, window, metric):
+        row = self._latest.get(zone, {}).get(window)
+        return None if row is None else row.get(metric)
+
+
+window_aggregates = WindowAggregates(max_zones=int(os.getenv("GRIDAI_MAX_ZONES", "10000")))
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    state = None
+    readings = rng.uniform(80, 200, 5000)
+    for chunk in np.array_split(readings, 50):
+        state = combine_values(state, [((v,), 1) for v in chunk])
+    print(summarize(state, "grid_load"), "exact p95:", round(float(np.percentile(readings, 95)), 2))
@@ -0,0 +1,509 @@
+"""
+End-to-end benchmarks for the stream pipeline and the HTTP API.
+
+Runs offline on one box and writes one JSON result file per run, so runs
+can be compared over time:
+
+    python benchmark.py                      # pipeline + http, saved to bench_results/
+    python benchmark.py pipeline --rates 1000 10000 50000 --seconds 5
+    python benchmark.py http --clients 32 --seconds 5
+    python benchmark.py all --baseline bench_results/baseline.json
+    python benchmark.py compare bench_results/a.json bench_results/b.json
+    python benchmark.py expressions --rows 1000000   # pw.apply UDFs vs native expressions
+    python benchmark.py scaling --workers 1 2 4 8    # pipeline records/s by Pathway worker count
+
+Comparing against a baseline flags every metric that got worse by more than
+--threshold (default 10%) and exits non-zero.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Benchmarks must never write into the live segment store
+os.environ["GRIDAI_SEGMENT_DIR"] = ""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+
+# Query strings for routes that need parameters
+ROUTE_PARAMS = {"/history": "?zone=Zone%20A&points=500"}
+# Routes that call out to third-party services or stream forever
+SKIP_ROUTES = {"/weather", "/sse/live", "/"}
+
+
+def percentiles(samples, scale=1000.0):
+    """p50/p90/p99/max of samples (seconds) in milliseconds."""
+    if not len(samples):
+        return {"count": 0}
+    arr = np.asarray(samples, dtype=np.float64) * scale
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        "count": int(arr.size),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+# ===============================
+# PIPELINE
+# ===============================
+
+class TimedLock:
+    """Drop-in for threading.Lock that records how long each holder kept it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self.holds = []
+        self.waits = []
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            self._acquired_at = time.perf_counter()
+            self.waits.append(self._acquired_at - start)
+        return ok
+
+    def release(self):
+        self.holds.append(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def reset(self):
+        self.holds, self.waits = [], []
+
+
+def bench_pipeline(rates, seconds, zones=100, meters=10, seed=1, drain_timeout=30.0):
+    """
+    Drives the Pathway pipeline with the synthetic fleet at each input rate
+    and measures throughput, generator→on_update latency and data_lock holds.
+    """
+    import stream
+    from loadgen import SyntheticLoad
+
+    lock = TimedLock()
+    stream.data_lock = lock
+    latencies = []
+    stream.add_row_listener(lambda row: latencies.append(time.time() - row["ts"]))
+
+    threading.Thread(target=stream.pathway_worker, daemon=True).start()
+    stream.pipeline_ready.wait()
+
+    generator = SyntheticLoad(zones=zones, meters_per_zone=meters, seed=seed)
+    steps = []
+    for rate in rates:
+        latencies.clear()
+        lock.reset()
+        generator.rate = rate
+        baseline = stream.processed_count
+        sent = 0
+
+        def emit(records):
+            nonlocal sent
+            stream.data_queue.put(records, policy="block")   # blocking: backpressure shows up as a lower input rate
+            sent += len(records)
+
+        started = time.perf_counter()
+        generator.run(emit, duration=seconds)
+        send_seconds = time.perf_counter() - started
+
+        deadline = time.perf_counter() + drain_timeout
+        while stream.processed_count - baseline < sent and time.perf_counter() < deadline:
+            time.sleep(0.02)
+        total_seconds = time.perf_counter() - started
+        processed = stream.processed_count - baseline
+
+        steps.append({
+            "target_rate": rate,
+            "input_rate": round(sent / send_seconds, 1),
+            "throughput": round(processed / total_seconds, 1),
+            "sent": sent,
+            "processed": processed,
+            "latency": percentiles(list(latencies)),
+            "lock_hold": percentiles(list(lock.holds)),
+            "lock_wait": percentiles(list(lock.waits)),
+        })
+        print(f"  pipeline @ {rate:>8} rec/s → {steps[-1]['throughput']:>10} rec/s, "
+              f"p99 latency {steps[-1]['latency'].get('p99_ms')} ms")
+
+    return {"zones": zones, "meters_per_zone": meters, "seconds": seconds, "steps": steps}
+
+
+# ===============================
+# WORKER SCALING
+# ===============================
+
+def _scaling_worker(records, zones, meters, batch=5000):
+    """
+    Pushes `records` synthetic readings through the full pipeline as fast as
+    it accepts them (GRIDAI_PATHWAY_WORKERS / GRIDAI_INGEST_PARTITIONS come
+    from the environment); prints the throughput as JSON.
+    """
+    import stream
+    from loadgen import SyntheticLoad
+
+    generator = SyntheticLoad(zones=zones, meters_per_zone=meters, seed=1)
+    # Generated up front, one second of event time per batch ending now, so the
+    # measurement is the pipeline's alone
+    end = time.time()
+    count = -(-records // batch)
+    batches = [
+        generator.to_records(generator.batch(end - count + k, end - count + k + 1, batch)) for k in range(count)
+    ]
+    sent = sum(len(b) for b in batches)
+
+    threading.Thread(target=stream.pathway_worker, daemon=True).start()
+    stream.pipeline_ready.wait()
+    started = time.perf_counter()
+    for records_batch in batches:
+        stream.data_queue.put(records_batch, policy="block")
+    deadline = time.perf_counter() + 120
+    while stream.processed_count < sent and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    seconds = time.perf_counter() - started
+    print(json.dumps({"records": sent, "processed": stream.processed_count, "seconds": seconds}))
+
+
+def bench_scaling(workers, records, zones=100, meters=10):
+    """
+    Saturation throughput of the pipeline for each Pathway worker count, with
+    input partitioned by zone over as many connectors. Each count runs in a
+    fresh process (the engine starts once per process).
+    """
+    steps = []
+    for n in workers:
+        env = {**os.environ, "GRIDAI_PATHWAY_WORKERS": str(n), "GRIDAI_INGEST_PARTITIONS": str(n),
+               "PATHWAY_THREADS": str(n)}
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "scaling-worker", "--records", str(records),
+             "--zones", str(zones), "--meters", str(meters)],
+            cwd=HERE, env=env, stderr=subprocess.DEVNULL,
+        )
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        throughput = result["processed"] / result["seconds"]
+        steps.append({
+            "workers": n,
+            "throughput": round(throughput, 1),
+            "speedup": round(throughput / steps[0]["throughput"], 2) if steps else 1.0,
+            "processed": result["processed"],
+            "seconds": round(result["seconds"], 3),
+        })
+        print(f"  {n:>3} worker(s) → {steps[-1]['throughput']:>10} rec/s (x{steps[-1]['speedup']})")
+    return {"records": records, "zones": zones, "meters_per_zone": meters, "steps": steps}
+
+
+# ===============================
+# PATHWAY EXPRESSIONS
+# ===============================
+
+EXPRESSION_VARIANTS = ("passthrough", "udf", "native")
+
+
+def _udf_columns(pw):
+    """The derived columns as per-row Python UDFs, as pathway_worker computed them before."""
+    return {
+        "risk_score_pw": pw.apply_with_type(
+            lambda v, c: round(min(v / c, 1.0), 3), float, pw.this.grid_load, pw.this.capacity,
+        ),
+        "renewable_percent": pw.apply_with_type(
+            lambda s, g: round((s / g) * 100, 2) if g > 0 else 0.0, float,
+            pw.this.solar_generation, pw.this.grid_load,
+        ),
+    }
+
+
+def _expressions_worker(variant, rows):
+    """Runs one variant over a static CSV of `rows` readings; prints engine seconds as JSON."""
+    import tempfile
+
+    import pathway as pw
+
+    import stream
+    from loadgen import SyntheticLoad
+
+    class Reading(pw.Schema):
+        grid_load: int
+        solar_generation: int
+        capacity: float
+
+    # CSV input is parsed natively, so the select is the only Python-visible work
+    cols = SyntheticLoad(zones=100, meters_per_zone=10, seed=1).batch(0.0, rows / 1000.0, rows)
+    path = os.path.join(tempfile.mkdtemp(prefix="gridai-bench-"), "readings.csv")
+    np.savetxt(
+        path, np.column_stack([cols["grid_load"], cols["solar_generation"], np.full(rows, 200)]),
+        fmt="%d", delimiter=",", header="grid_load,solar_generation,capacity", comments="",
+    )
+    table = pw.io.csv.read(path, schema=Reading, mode="static")
+    derived = {"udf": _udf_columns, "native": stream.derived_columns}.get(variant)
+    out = table.select(pw.this.grid_load, **(derived(pw) if derived else {}))
+    pw.io.null.write(out)
+
+    started = time.perf_counter()
+    try:
+        pw.run(monitoring_level=pw.MonitoringLevel.NONE)
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    print(json.dumps({"seconds": time.perf_counter() - started}))
+
+
+def bench_expressions(rows):
+    """
+    Engine throughput of the derived-column select with per-row pw.apply UDFs
+    versus native expressions (plus a passthrough select as the floor). Each
+    variant runs in its own process on a static table, so only the engine
+    work differs.
+    """
+    results = {}
+    for variant in EXPRESSION_VARIANTS:
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "expressions-worker", variant, "--rows", str(rows)],
+            cwd=HERE, stderr=subprocess.DEVNULL,
+        )
+        seconds = json.loads(output.decode().strip().splitlines()[-1])["seconds"]
+        results[variant] = {"seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds, 1)}
+        print(f"  {variant:<12} {results[variant]['rows_per_sec']:>12} rows/s")
+    return {"rows": rows, "variants": results}
+
+
+# ===============================
+# HTTP API
+# ===============================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def api_routes():
+    """GET routes of main.app worth benchmarking, with their query strings."""
+    sys.path.insert(0, HERE)
+    import main
+    from fastapi.routing import APIRoute
+
+    routes = []
+    for route in main.app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if "{" in route.path or route.path in SKIP_ROUTES:
+            continue
+        routes.append(route.path + ROUTE_PARAMS.get(route.path, ""))
+    return routes
+
+
+def _client(port, path, deadline, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors.append("conn")
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.close()
+
+
+def bench_http(clients, seconds, warmup=8.0, routes=None, env=None):
+    """
+    Starts the API in a uvicorn subprocess and hammers each route with
+    `clients` concurrent keep-alive clients for `seconds`.
+    """
+    routes = routes or api_routes()
+    port = _free_port()
+    server_env = dict(os.environ, **(env or {}))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(warmup)   # let the stream and pipeline produce data
+        results = {}
+        for path in routes:
+            latencies, errors = [], []
+            deadline = time.perf_counter() + seconds
+            threads = [
+                threading.Thread(target=_client, args=(port, path, deadline, latencies, errors))
+                for _ in range(clients)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            results[path] = {
+                "rps": round(len(latencies) / seconds, 1),
+                "errors": len(errors),
+                "latency": percentiles(latencies),
+            }
+            print(f"  http {path:<40} {results[path]['rps']:>9} req/s, "
+                  f"p99 {results[path]['latency'].get('p99_ms')} ms")
+        return {"clients": clients, "seconds": seconds, "routes": results}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+# ===============================
+# RESULTS
+# ===============================
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, path=None):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = path or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def flatten_metrics(results):
+    """{metric name: (value, higher_is_better)} for every comparable number in a result file."""
+    metrics = {}
+    for step in results.get("pipeline", {}).get("steps", []):
+        key = f"pipeline@{step['target_rate']}"
+        metrics[f"{key}.throughput"] = (step["throughput"], True)
+        for name in ("latency", "lock_hold"):
+            if "p99_ms" in step[name]:
+                metrics[f"{key}.{name}.p99_ms"] = (step[name]["p99_ms"], False)
+    for step in results.get("scaling", {}).get("steps", []):
+        metrics[f"scaling@{step['workers']}.throughput"] = (step["throughput"], True)
+    for variant, result in results.get("expressions", {}).get("variants", {}).items():
+        metrics[f"expressions.{variant}.rows_per_sec"] = (result["rows_per_sec"], True)
+    for path, route in results.get("http", {}).get("routes", {}).items():
+        metrics[f"http{path}.rps"] = (route["rps"], True)
+        if "p99_ms" in route["latency"]:
+            metrics[f"http{path}.p99_ms"] = (route["latency"]["p99_ms"], False)
+    return metrics
+
+
+def compare(baseline, current, threshold=0.10):
+    """List of regressions (metrics worse than baseline by more than threshold)."""
+    base, cur = flatten_metrics(baseline), flatten_metrics(current)
+    regressions = []
+    for name, (old, higher_is_better) in base.items():
+        if name not in cur or not old:
+            continue
+        new = cur[name][0]
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append({"metric": name, "baseline": old, "current": new,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+
+def _report_regressions(regressions):
+    if not regressions:
+        print("✅ No regressions against baseline.")
+        return 0
+    print(f"🚨 {len(regressions)} regression(s) against baseline:")
+    for r in regressions:
+        print(f"  {r['metric']}: {r['baseline']} → {r['current']} ({r['change_pct']:+}%)")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GridAI pipeline / API benchmarks.")
+    parser.add_argument("suite", nargs="?", default="all",
+                        choices=["all", "pipeline", "http", "expressions", "scaling", "compare",
+                                 "expressions-worker", "scaling-worker"])
+    parser.add_argument("files", nargs="*", help="compare: BASELINE CURRENT")
+    parser.add_argument("--rows", type=int, default=1000000, help="expressions: rows per variant")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)],
+                        help="scaling: Pathway worker counts")
+    parser.add_argument("--records", type=int, default=500000, help="scaling: readings per worker count")
+    parser.add_argument("--rates", type=int, nargs="+", default=[1000, 5000, 10000, 20000, 50000])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--zones", type=int, default=100)
+    parser.add_argument("--meters", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--baseline", help="result file to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--out", help="result file path (default: bench_results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.suite == "expressions-worker":
+        _expressions_worker(args.files[0], args.rows)
+        sys.stdout.flush()
+        os._exit(0)
+
+    if args.suite == "scaling-worker":
+        _scaling_worker(args.records, args.zones, args.meters)
+        sys.stdout.flush()
+        os._exit(0)
+
+    if args.suite == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs BASELINE and CURRENT result files")
+        with open(args.files[0]) as f:
+            baseline = json.load(f)
+        with open(args.files[1]) as f:
+            current = json.load(f)
+        sys.exit(_report_regressions(compare(baseline, current, args.threshold)))
+
+    results = {
+        "meta": {
+            "started": datetime.now().isoformat(),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+    }
+    # HTTP first: the pipeline bench starts Pathway in this process
+    if args.suite in ("all", "http"):
+        print("🌐 HTTP API benchmark")
+        results["http"] = bench_http(args.clients, args.seconds)
+    if args.suite in ("all", "expressions"):
+        print("🧮 Pathway expression benchmark")
+        results["expressions"] = bench_expressions(args.rows)
+    if args.suite in ("all", "scaling"):
+        print("🧵 Worker scaling benchmark")
+        results["scaling"] = bench_scaling(args.workers, args.records, args.zones, args.meters)
+    if args.suite in ("all", "pipeline"):
+        print("⚙️ Pipeline benchmark")
+        results["pipeline"] = bench_pipeline(args.rates, args.seconds, args.zones, args.meters)
+
+    path = save_results(results, args.out)
+    print(f"📄 Results written to {path}")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            status = _report_regressions(compare(json.load(f), results, args.threshold))
+    sys.stdout.flush()
+    os._exit(status)   # the Pathway engine thread does not stop on its own
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+
+class Broadcaster:
+    """
+    Fans every new live frame out to all WebSocket / SSE subscribers.
+
+    publish() is called from the stream threads and never blocks: it swaps in
+    the newest frame and schedules at most one wake-up on the event loop.
+    Each subscriber only ever sees the newest frame, so a slow client skips
+    the frames it missed instead of queueing them up behind the pipeline.
+    """
+
+    def __init__(self):
+        self._latest = (0, None)      # (version, frame) — swapped as one reference
+        self._loop = None
+        self._waiters = set()         # one asyncio.Event per subscriber
+        self._wake_pending = False
+        self._publish_lock = threading.Lock()
+
+    @property
+    def subscriber_count(self):
+        return len(self._waiters)
+
+    def bind(self, loop):
+        """Attach the event loop the subscribers run on (call once at startup)."""
+        self._loop = loop
+
+    def publish(self, frame):
+        """Store ``frame`` as the newest frame and wake subscribers. Safe from any thread."""
+        loop = self._loop
+        with self._publish_lock:
+            version = self._latest[0] + 1
+            self._latest = (version, frame)
+            if loop is None or loop.is_closed() or self._wake_pending:
+                return
+            self._wake_pending = True
+
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # Loop shut down between the check and the call
+            self._wake_pending = False
+
+    def _wake(self):
+        self._wake_pending = False
+        for event in self._waiters:
+            event.set()
+
+    async def subscribe(self):
+        """Async iterator yielding the newest frame each time it changes."""
+        event = asyncio.Event()
+        self._waiters.add(event)
+        seen = 0
+        try:
+            while True:
+                version, frame = self._latest
+                if version == seen or frame is None:
+                    await event.wait()
+                    event.clear()
+                    continue
+                seen = version
+                yield frame
+        finally:
+            self._waiters.discard(event)
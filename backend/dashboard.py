@@ -0,0 +1,384 @@
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+import stream
+import risk
+import theft
+from prediction import forecaster
+from sustainability import calculate_sustainability
+import map as map_layer
+
+
+try:
+    import orjson
+
+    def encode_json(value):
+        """value as compact JSON bytes (orjson; NaN encodes as null)."""
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    def encode_json(value):
+        """value as compact JSON bytes (stdlib fallback when orjson is not installed)."""
+        return json.dumps(value, separators=(",", ":")).encode()
+
+
+# One precomputed dashboard payload, stamped with its stream snapshot's version.
+# body is the serialised payload and etag its HTTP validator, both built once;
+# sections caches each payload part's encoding (see encoded_section); feeders
+# and map are the FeederSnapshot and map.MapSnapshot it was built from.
+Dashboard = namedtuple("Dashboard", ["version", "payload", "body", "etag", "sections", "feeders", "map"])
+
+# Distinguishes versions across restarts so a stale client ETag never matches
+_BOOT_ID = format(int(time.time()), "x")
+
+
+# ===============================
+# VIEWS
+# ===============================
+
+def _finite(value):
+    return None if value != value else value
+
+
+def _initializing(data):
+    return not data or data.get("zone") == "Initializing..."
+
+
+def predictions_view(data):
+    if _initializing(data):
+        return {"error": "Stream initializing"}
+    return {
+        "current_load": data["grid_load"],
+        "predicted_load": data.get("predicted_load", 0),
+        "interval_seconds": forecaster.interval,
+        "mape": _finite(forecaster.mape()),
+    }
+
+
+# Risk for every zone-store zone, materialised incrementally like
+# map.MapLayer. feeders is most utilised first (order: their rows), alerts
+# one per HIGH/MEDIUM feeder in the same order; rows, fragments (each row's
+# feeder as JSON bytes) and changed (zone store seq of each row's last
+# rescore, for deltas) are aligned with the zone store's rows. Never
+# modified once published.
+FeederSnapshot = namedtuple(
+    "FeederSnapshot", ["seq", "feeders", "alerts", "summary", "rows", "fragments", "changed", "order"],
+)
+
+
+def _feeder_alert(feeder):
+    if feeder["risk_level"] == "HIGH":
+        return f"🚨 High overload risk detected: {feeder['feeder']} at {feeder['utilisation']:.0%} of capacity"
+    if feeder["risk_level"] == "MEDIUM":
+        return f"⚠️ Moderate load risk: {feeder['feeder']} at {feeder['utilisation']:.0%} of capacity"
+    return None
+
+
+class FeederRisk:
+    """
+    Risk of every feeder against its configured capacity, kept current per
+    stream update. refresh() rescores only the zones the zone store recorded
+    since the last refresh; the ordering, alerts and summary are then
+    re-derived from the stored per-zone values, so a refresh costs Python
+    work per changed zone and one vectorised sort over all of them.
+    """
+
+    def __init__(self, zone_store=None):
+        self.zone_store = zone_store or stream.zone_store
+        self._lock = threading.Lock()
+        self._utilisation = np.empty(0)
+        self._levels = np.empty(0, dtype=np.int8)
+        self._alerts = []
+        self._current = FeederSnapshot(
+            0, [], [], {"HIGH": 0, "MEDIUM": 0, "LOW": 0}, [], [], np.empty(0, dtype=np.int64), [],
+        )
+
+    def refresh(self):
+        """Folds zone store changes into a new snapshot; returns the current snapshot."""
+        with self._lock:
+            prev = self._current
+            rows, seq = self.zone_store.changed_since(prev.seq)
+            if not len(rows):
+                return prev
+            names, values = self.zone_store.latest_matrix(("grid_load",))
+            n = len(names)
+            rows = rows[rows < min(n, len(values))]
+
+            grow = n - len(prev.rows)
+            if grow > 0:
+                self._utilisation = np.concatenate([self._utilisation, np.full(grow, np.nan)])
+                self._levels = np.concatenate([self._levels, np.zeros(grow, dtype=np.int8)])
+                self._alerts.extend([None] * grow)
+            feeder_rows = list(prev.rows) + [None] * max(grow, 0)
+            fragments = list(prev.fragments) + [None] * max(grow, 0)
+            changed = np.concatenate([prev.changed, np.zeros(max(grow, 0), dtype=np.int64)])
+
+            loads = values[rows, 0]
+            capacities = risk.capacities.capacities(names)[rows]
+            scored = risk.score_batch(loads, capacities)
+            self._utilisation[rows] = scored["utilisation"]
+            self._levels[rows] = scored["levels"]
+            columns = zip(
+                rows.tolist(), loads.tolist(), capacities.tolist(), scored["utilisation"].round(3).tolist(),
+                scored["headroom"].round(1).tolist(), risk.RISK_LEVELS[scored["levels"]].tolist(),
+            )
+            for i, l, c, u, h, r in columns:
+                feeder = {"feeder": names[i], "load": l, "capacity": c, "utilisation": u, "headroom": h, "risk_level": r}
+                feeder_rows[i] = feeder
+                fragments[i] = encode_json(feeder)
+                self._alerts[i] = _feeder_alert(feeder) if u == u else None
+            changed[rows] = seq
+
+            utilisation = self._utilisation
+            order = np.argsort(-np.nan_to_num(utilisation, nan=-1.0), kind="stable")
+            order = order[~np.isnan(utilisation[order])].tolist()
+            counts = np.bincount(self._levels[order], minlength=3).tolist()
+            alerts = self._alerts
+            self._current = FeederSnapshot(
+                seq,
+                [feeder_rows[i] for i in order],
+                [alerts[i] for i in order if alerts[i] is not None],
+                {"HIGH": counts[2], "MEDIUM": counts[1], "LOW": counts[0]},
+                feeder_rows,
+                fragments,
+                changed,
+                order,
+            )
+            return self._current
+
+    def current(self):
+        return self._current
+
+
+feeder_layer = FeederRisk()
+
+
+def feeder_risk(zone_store=None):
+    """
+    Risk for every feeder against its configured capacity, most utilised
+    first (the current feeder layer, refreshed from the zone store).
+    """
+    layer = feeder_layer if zone_store is None else FeederRisk(zone_store)
+    return layer.refresh().feeders
+
+
+def risk_view(data, feeders=None):
+    if _initializing(data):
+        return {"error": "Stream initializing"}
+    feeders = feeders or feeder_layer.current()
+    risk_score = data.get("risk_score_pw", 0)
+    return {
+        # Latest reading's feeder, kept for existing clients
+        "risk_score": risk_score,
+        "risk_level": risk.risk_level(risk_score),
+        "summary": dict(feeders.summary),
+        "feeders": feeders.feeders,
+    }
+
+
+def alerts_view(data, feeders=None):
+    if _initializing(data):
+        return {"alerts": ["Initializing system..."]}
+    feeders = feeders or feeder_layer.current()
+    return {"alerts": feeders.alerts}
+
+
+def sustainability_view(data):
+    if _initializing(data):
+        return {"error": "Stream initializing"}
+    return calculate_sustainability(data["solar_generation"], data["grid_load"])
+
+
+def theft_view(data):
+    if _initializing(data):
+        return {"theft_risk": "LOW"}
+    # Worst level, counts and strongest suspects from the streaming per-meter detector
+    return theft.monitor.summary()
+
+
+def build_dashboard(data, feeders=None, layer=None):
+    """Everything the dashboard shows for one snapshot."""
+    feeders = feeders or feeder_layer.refresh()
+    layer = layer or map_layer.layer.refresh()
+    return {
+        "live": data,
+        "predictions": predictions_view(data),
+        "risk": risk_view(data, feeders),
+        "sustainability": sustainability_view(data),
+        "alerts": alerts_view(data, feeders),
+        "map": map_layer.get_map_data(snapshot=layer),
+        "theft": theft_view(data),
+    }
+
+
+def _splice(head, key, body):
+    # JSON object bytes head with key: body (already encoded) appended
+    return head[:-1] + (b',"' if len(head) > 2 else b'"') + key.encode() + b'":' + body + b"}"
+
+
+def _encode_dashboard(payload, feeders, layer):
+    # The feeders and the map are spliced in from the per-zone encodings kept
+    # by their layers; only the rest of the payload is encoded per build
+    risk_part = payload["risk"]
+    if "feeders" in risk_part:
+        fragments = feeders.fragments
+        listing = b"[" + b",".join([fragments[i] for i in feeders.order]) + b"]"
+        risk_body = _splice(encode_json({k: v for k, v in risk_part.items() if k != "feeders"}), "feeders", listing)
+    else:
+        risk_body = encode_json(risk_part)
+    head = encode_json({k: v for k, v in payload.items() if k not in ("risk", "map")})
+    head = _splice(head, "risk", risk_body)
+    return _splice(head, "map", map_layer.encode_map_data(snapshot=layer).encode())
+
+
+# ===============================
+# DERIVED VIEW
+# ===============================
+
+class DerivedView:
+    """
+    Holds the dashboard payload for the current stream snapshot.
+
+    The pipeline thread only submit()s each new snapshot; a builder thread
+    (start()) derives the newest one submitted, skipping any superseded
+    while it was busy, so dashboard cost never lands on the pipeline and
+    scales with the build rate, not the commit rate. current() builds on
+    the request if the stream has moved past the last build. The dashboard
+    carries its stream snapshot's version; an older snapshot is ignored.
+
+    The builder also encodes the /ws/live delta from the dashboard it
+    published before and publishes a LiveFrame, so live clients only pick
+    pre-encoded frames (see catch_up) and never build one on the event loop.
+    """
+
+    def __init__(self, delta_history=16):
+        self._lock = threading.Lock()
+        self._current = None
+        self._pending = None
+        self._wake = threading.Event()
+        self._published = None
+        self._deltas = deque(maxlen=delta_history)
+
+    def update(self, snapshot):
+        with self._lock:
+            if self._current is not None and snapshot.version <= self._current.version:
+                return self._current
+
+            version = snapshot.version
+            feeders, layer = feeder_layer.refresh(), map_layer.layer.refresh()
+            payload = build_dashboard(snapshot.data, feeders, layer)
+            payload["version"] = version
+            payload["source_ts"] = snapshot.source_ts
+            body = _encode_dashboard(payload, feeders, layer)
+
+            self._current = Dashboard(
+                version, payload, body, f'"{_BOOT_ID}-{version}"', {}, feeders, layer,
+            )
+            return self._current
+
+    def submit(self, snapshot):
+        """Hands a new stream snapshot to the builder thread; returns at once."""
+        self._pending = snapshot
+        self._wake.set()
+
+    def start(self, on_built=None):
+        """Starts the builder thread; on_built(live_frame) runs after every new dashboard."""
+        threading.Thread(target=self._run, args=(on_built,), daemon=True, name="gridai-dashboard").start()
+
+    def _run(self, on_built):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                frame = self.build_live(self._pending)
+            except Exception as e:
+                print(f"⚠️ Dashboard build failed: {e}")
+                continue
+            if frame is not None and on_built is not None:
+                on_built(frame)
+
+    def build_live(self, snapshot):
+        """
+        Derives snapshot's dashboard and its LiveFrame (None if the last one
+        published is already this version). Builder thread only.
+        """
+        dashboard = self.update(snapshot)
+        previous = self._published
+        if previous is not None and dashboard.version <= previous.version:
+            return None
+        if previous is not None:
+            self._deltas.append((previous.version, dashboard.version, live_frame(previous, dashboard).decode()))
+        self._published = dashboard
+        return LiveFrame(dashboard.version, dashboard.body.decode(), tuple(self._deltas))
+
+    def current(self):
+        """Latest precomputed dashboard (built from the current snapshot if the last build is behind)."""
+        dashboard = self._current
+        latest = stream.latest_snapshot
+        if dashboard is None or dashboard.version < latest.version:
+            dashboard = self.update(latest)
+        return dashboard
+
+
+view = DerivedView()
+
+
+def encoded_section(dashboard, key):
+    """payload[key] of dashboard as JSON bytes: encoded on first use, then cached with that version."""
+    body = dashboard.sections.get(key)
+    if body is None:
+        body = dashboard.sections[key] = encode_json(dashboard.payload[key])
+    return body
+
+
+# Payload parts sent whole in every /ws/live delta frame (risk's feeders,
+# alerts and the map are sent as changes only)
+DELTA_SECTIONS = ("live", "predictions", "sustainability", "theft")
+
+
+# Published on the live channel for every new dashboard: the whole body and
+# the most recent deltas as (since, version, frame), oldest first and
+# contiguous, all encoded by the builder
+LiveFrame = namedtuple("LiveFrame", ["version", "body", "deltas"])
+
+
+def live_frame(previous, current):
+    """
+    The /ws/live frame that takes a client from dashboard previous to
+    current: the whole dashboard for a new client (previous None), else a
+    delta {"delta": true, "since": previous version, ...} carrying the
+    small sections whole and only the feeders, their alerts and the map
+    features (or, for an aggregated map, cells) that changed in between.
+    """
+    if previous is None or previous.version >= current.version:
+        return current.body
+    payload = current.payload
+    parts = {"delta": True, "since": previous.version, "version": current.version, "source_ts": payload["source_ts"]}
+    parts.update((name, payload[name]) for name in DELTA_SECTIONS)
+    risk_part = payload["risk"]
+    if "feeders" in risk_part:
+        rows = np.flatnonzero(current.feeders.changed > previous.feeders.seq).tolist()
+        feeders = [current.feeders.rows[i] for i in rows]
+        risk_part = {**risk_part, "feeders": feeders}
+        parts["alerts"] = {"alerts": [a for a in map(_feeder_alert, feeders) if a is not None]}
+    parts["risk"] = risk_part
+    parts["map"] = map_layer.changed_features(current.map, previous.map.version)
+    return encode_json(parts)
+
+
+def catch_up(frame, sent):
+    """
+    The frames that take a live client from version sent (None: nothing
+    yet) to LiveFrame frame: the deltas in between while frame still holds
+    them, else the whole body. Only picks pre-encoded strings.
+    """
+    if sent is not None:
+        if sent >= frame.version:
+            return []
+        for i, (since, _, _) in enumerate(frame.deltas):
+            if since == sent:
+                return [delta for _, _, delta in frame.deltas[i:]]
+    return [frame.body]
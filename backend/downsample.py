@@ -0,0 +1,97 @@
+import numpy as np
+
+
+# Server-side downsampling of (ts, value) series for charts.
+# All modes take sorted float arrays and return at most ~`points` samples.
+
+MODES = ("lttb", "minmax", "avg")
+
+
+def _bucket_edges(n, buckets):
+    """Start index of each of `buckets` equal-width index buckets over n points, plus n."""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def lttb(ts, values, points):
+    """
+    Largest-triangle-three-buckets: keeps the visual shape of the series.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    chosen point and the next bucket's mean. Per-bucket work is vectorised.
+    """
+    n = len(ts)
+    if points >= n or points < 3:
+        return ts, values
+
+    # Interior points 1..n-2 split into points-2 buckets
+    edges = 1 + _bucket_edges(n - 2, points - 2)
+    sums_t = np.add.reduceat(ts[1:n - 1], edges[:-1] - 1)
+    sums_v = np.add.reduceat(values[1:n - 1].astype(np.float64), edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_t = np.append(sums_t / counts, ts[-1])
+    mean_v = np.append(sums_v / counts, values[-1])
+
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        bt, bv = ts[lo:hi], values[lo:hi]
+        area = np.abs(
+            (ts[a] - mean_t[b + 1]) * (bv - values[a])
+            - (ts[a] - bt) * (mean_v[b + 1] - values[a])
+        )
+        a = lo + int(np.argmax(area))
+        chosen[b + 1] = a
+
+    return ts[chosen], values[chosen]
+
+
+def minmax(ts, values, points):
+    """Keeps each bucket's minimum and maximum (at most 2 points per bucket) so spikes survive."""
+    n = len(ts)
+    buckets = max(points // 2, 1)
+    if 2 * buckets >= n:
+        return ts, values
+
+    edges = _bucket_edges(n, buckets)
+    starts = edges[:-1]
+    width = int(np.max(np.diff(edges)))
+
+    # Pad every bucket to the same width by repeating its last index, so
+    # argmin/argmax run over a (buckets, width) grid in one pass
+    idx = starts[:, None] + np.arange(width)[None, :]
+    idx = np.minimum(idx, edges[1:, None] - 1)
+    grid = values[idx]
+    rows = np.arange(buckets)
+    lo = idx[rows, np.argmin(grid, axis=1)]
+    hi = idx[rows, np.argmax(grid, axis=1)]
+
+    # Sorted, and a flat bucket (min and max the same point) keeps it once
+    chosen = np.unique(np.concatenate([lo, hi]))
+    return ts[chosen], values[chosen]
+
+
+def avg(ts, values, points):
+    """Mean time and value of each bucket."""
+    n = len(ts)
+    if points >= n:
+        return ts, values
+
+    edges = _bucket_edges(n, points)
+    counts = np.diff(edges)
+    return (
+        np.add.reduceat(ts, edges[:-1]) / counts,
+        np.add.reduceat(values.astype(np.float64), edges[:-1]) / counts,
+    )
+
+
+def downsample(ts, values, points, mode="lttb"):
+    if mode == "lttb":
+        return lttb(ts, values, points)
+    if mode == "minmax":
+        return minmax(ts, values, points)
+    if mode == "avg":
+        return avg(ts, values, points)
+    raise ValueError(f"Unknown downsampling mode: {mode}")
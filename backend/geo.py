@@ -0,0 +1,180 @@
+"""
+Zone geometry: a GeoJSON zone registry with a uniform-grid spatial index.
+
+    python geo.py --synthetic 10000 > zones-10k.geojson   # grid of loadgen zones
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+
+def _rings(geometry):
+    """Outer rings of a Polygon / MultiPolygon (a Point becomes a one-vertex ring)."""
+    kind, coords = geometry["type"], geometry["coordinates"]
+    if kind == "Point":
+        return [[coords]]
+    if kind == "Polygon":
+        return [coords[0]]
+    if kind == "MultiPolygon":
+        return [polygon[0] for polygon in coords]
+    raise ValueError(f"Unsupported geometry type '{kind}'")
+
+
+def _centroid(rings):
+    """Area-weighted centroid of the rings (vertex mean for degenerate shapes)."""
+    area = cx = cy = 0.0
+    for ring in rings:
+        xy = np.asarray(ring, dtype=np.float64)
+        x, y = xy[:, 0], xy[:, 1]
+        x1, y1 = np.roll(x, -1), np.roll(y, -1)
+        cross = x * y1 - x1 * y
+        a = cross.sum() / 2
+        area += a
+        cx += ((x + x1) * cross).sum() / 6
+        cy += ((y + y1) * cross).sum() / 6
+    if abs(area) < 1e-12:
+        xy = np.concatenate([np.asarray(r, dtype=np.float64) for r in rings])
+        return float(xy[:, 0].mean()), float(xy[:, 1].mean())
+    return cx / area, cy / area
+
+
+class ZoneRegistry:
+    """
+    Zones of the service territory, from a GeoJSON FeatureCollection. Each
+    feature has a "name" (display label) and optionally a "zone" property
+    holding the stream zone it maps to (defaults to the name).
+
+    Geometry is held columnar: lon/lat (centroid) arrays and an [n x 4]
+    bbox array (min lon, min lat, max lon, max lat). A uniform grid maps
+    each cell to the zones whose bbox overlaps it, so a bbox query only
+    looks at zones near the viewport.
+    """
+
+    def __init__(self, features=()):
+        names, labels, centroids, bboxes = [], [], [], []
+        for feature in features:
+            rings = _rings(feature["geometry"])
+            xy = np.concatenate([np.asarray(r, dtype=np.float64).reshape(-1, 2) for r in rings])
+            properties = feature["properties"]
+            names.append(properties.get("zone", properties["name"]))
+            labels.append(properties["name"])
+            centroids.append(_centroid(rings))
+            bboxes.append((xy[:, 0].min(), xy[:, 1].min(), xy[:, 0].max(), xy[:, 1].max()))
+
+        self.names = names      # stream zone names
+        self.labels = labels
+        self.index = {name: i for i, name in enumerate(names)}
+        centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2).round(6)
+        self.lon, self.lat = centroids[:, 0], centroids[:, 1]
+        self.bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        self._build_grid()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                collection = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(collection.get("features", []))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build_grid(self):
+        n = len(self.names)
+        self._cells = {}
+        if not n:
+            self.cell_size = 1.0
+            return
+        # Roughly one zone per cell, never finer than the typical zone size
+        extent = self.bboxes[:, 2:].max(axis=0) - self.bboxes[:, :2].min(axis=0)
+        typical = np.median(self.bboxes[:, 2:] - self.bboxes[:, :2])
+        self.cell_size = max(float(extent.max()) / math.sqrt(n), float(typical), 1e-6)
+
+        lo = np.floor(self.bboxes[:, :2] / self.cell_size).astype(np.int64)
+        hi = np.floor(self.bboxes[:, 2:] / self.cell_size).astype(np.int64)
+        for i in range(n):
+            for cx in range(lo[i, 0], hi[i, 0] + 1):
+                for cy in range(lo[i, 1], hi[i, 1] + 1):
+                    self._cells.setdefault((cx, cy), []).append(i)
+        self._cells = {cell: np.asarray(zones, dtype=np.int64) for cell, zones in self._cells.items()}
+
+    def query(self, bbox=None):
+        """Indices of zones whose bbox intersects bbox (all zones if None), in registry order."""
+        n = len(self.names)
+        if bbox is None:
+            return np.arange(n)
+        min_lon, min_lat, max_lon, max_lat = bbox
+        lo_x, lo_y = math.floor(min_lon / self.cell_size), math.floor(min_lat / self.cell_size)
+        hi_x, hi_y = math.floor(max_lon / self.cell_size), math.floor(max_lat / self.cell_size)
+
+        # Small viewports walk their grid cells; one spanning a good part of the
+        # territory is cheaper as a single vectorised pass over every bbox
+        if (hi_x - lo_x + 1) * (hi_y - lo_y + 1) * 4 > len(self._cells):
+            idx = np.arange(n)
+        else:
+            candidates = [
+                self._cells[cell]
+                for cell in ((cx, cy) for cx in range(lo_x, hi_x + 1) for cy in range(lo_y, hi_y + 1))
+                if cell in self._cells
+            ]
+            if not candidates:
+                return np.empty(0, dtype=np.int64)
+            idx = np.unique(np.concatenate(candidates))
+
+        b = self.bboxes[idx]
+        hit = (b[:, 0] <= max_lon) & (b[:, 2] >= min_lon) & (b[:, 1] <= max_lat) & (b[:, 3] >= min_lat)
+        return idx[hit]
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' → tuple of floats (ValueError if malformed)."""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs 4 comma-separated numbers: min_lon,min_lat,max_lon,max_lat")
+    if not all(math.isfinite(p) for p in parts):
+        raise ValueError("bbox values must be finite numbers")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox min must not exceed max")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def synthetic_zones(names, origin=(76.8, 28.4), cell=0.01):
+    """GeoJSON FeatureCollection laying names out as square cells on a grid."""
+    side = math.ceil(math.sqrt(len(names))) or 1
+    features = []
+    for i, name in enumerate(names):
+        x = origin[0] + (i % side) * cell
+        y = origin[1] + (i // side) * cell
+        ring = [[x, y], [x + cell, y], [x + cell, y + cell], [x, y + cell], [x, y]]
+        features.append({
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+registry = ZoneRegistry.load(
+    os.getenv("GRIDAI_ZONES_FILE", os.path.join(os.path.dirname(__file__), "zones.geojson"))
+)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from loadgen import zone_names
+
+    parser = argparse.ArgumentParser(description="Zone geometry tools.")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="write a grid GeoJSON for N loadgen zones")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        json.dump(synthetic_zones(zone_names(args.synthetic)), sys.stdout)
+    else:
+        print(f"{len(registry)} zones, grid cell {registry.cell_size:.4f}°, {len(registry._cells)} cells")
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+
+import stream
+from aggregates import AGG_METRICS, RESOLUTIONS, window_aggregates
+from downsample import MODES, downsample
+from zonestore import METRICS
+
+
+MAX_POINTS = 10000
+
+
+def query_history(zone, metric=None, start=None, end=None, points=1000, mode="lttb", resolution="raw"):
+    """
+    Readings of one zone/metric between start and end (epoch seconds) from the
+    in-memory ring buffers and, further back, the on-disk segment store —
+    downsampled server-side to at most ~points samples.
+
+    With a resolution from aggregates.RESOLUTIONS the series comes from that
+    resolution's window store instead: one point per window (ts = window
+    start), metrics from AGG_METRICS; a reading field (or the default,
+    grid_load) stands for its window average.
+    """
+    metric = metric or "grid_load"
+    if resolution == "raw":
+        store, known = stream.zone_store, METRICS
+    elif resolution in RESOLUTIONS:
+        store, known = window_aggregates.stores[resolution], AGG_METRICS
+        if metric not in known and f"{metric}_avg" in known:
+            metric = f"{metric}_avg"
+    else:
+        return {"error": f"Unknown resolution '{resolution}'", "resolutions": ["raw", *RESOLUTIONS]}
+    if metric not in known:
+        return {"error": f"Unknown metric '{metric}'", "metrics": list(known)}
+    if mode not in MODES:
+        return {"error": f"Unknown mode '{mode}'", "modes": list(MODES)}
+    history = store.zone(zone)
+    on_disk = (resolution == "raw" and stream.segment_store is not None
+               and stream.segment_store.zone_id(zone) is not None)
+    if history is None and not on_disk:
+        return {"error": f"Unknown zone '{zone}'", "zones": store.zones()}
+
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    points = min(max(points, 3), MAX_POINTS)
+
+    if history is not None and len(history):
+        ts, values = history.series(metric, since=start)
+        stop = np.searchsorted(ts, end, side="right")
+        ts, values = ts[:stop], values[:stop]
+        retained_from = history.oldest()
+    else:
+        ts, values = np.empty(0), np.empty(0, dtype=np.float32)
+        retained_from = end
+
+    # Anything older than the in-memory ring comes from the segment store
+    if on_disk and start < retained_from:
+        disk_ts, disk_values = stream.segment_store.read(zone, metric, start, min(end, retained_from))
+        older = disk_ts < retained_from
+        ts = np.concatenate([disk_ts[older], ts])
+        values = np.concatenate([disk_values[older], values])
+
+    present = ~np.isnan(values)
+    if not present.all():
+        ts, values = ts[present], values[present]
+    raw_points = len(ts)
+
+    ts, values = downsample(ts, values, points, mode)
+
+    return {
+        "zone": zone,
+        "metric": metric,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "mode": mode,
+        "raw_points": raw_points,
+        "points": len(ts),
+        "ts": np.round(ts, 3).tolist(),
+        "values": np.round(values.astype(np.float64), 4).tolist(),
+    }
@@ -0,0 +1,418 @@
+import collections
+import io
+import json
+import math
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import metrics
+
+
+# What put() does when the queue has no room for a batch:
+#   block        wait for the connector to drain it (producers slow down)
+#   drop-oldest  discard the oldest queued records (freshest data wins)
+#   drop-newest  discard the incoming records that do not fit
+#   sample       above the sampling watermark keep an evenly spaced share of each
+#                batch, shrinking as the queue fills; drop-newest once full
+POLICIES = ("block", "drop-oldest", "drop-newest", "sample")
+
+ingest_dropped = metrics.registry.register(metrics.Counter(
+    "gridai_ingest_dropped_total", "Records discarded by the ingest queue's overflow policy, per zone.",
+    labels=("zone", "policy"),
+))
+ingest_batches = metrics.registry.register(metrics.Histogram(
+    "gridai_ingest_batch_records", "Records per batch drained into the Pathway connector (one commit each).",
+    buckets=(1, 10, 100, 1000, 5000, 10000, 50000),
+))
+
+
+class IngestQueue:
+    """
+    Bounded queue of records between producers and the Pathway connector.
+
+    Bounded in records, not items, so a synthetic batch counts for its size.
+    Producers put single records or lists; the connector drains everything
+    waiting (up to a batch limit) in one call. When full, the overflow
+    policy decides what is lost, and every dropped record is counted per
+    zone in gridai_ingest_dropped_total.
+    """
+
+    def __init__(self, max_records=100000, policy="drop-oldest", sample_above=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}' (expected one of {', '.join(POLICIES)})")
+        self.max_records = max_records
+        self.policy = policy
+        self.sample_above = sample_above
+        self._records = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.dropped = 0
+
+    def qsize(self):
+        return len(self._records)
+
+    def put(self, item, policy=None):
+        """
+        Queues a record or a list of records under policy (the queue's own by
+        default); returns how many were accepted.
+        """
+        records = item if isinstance(item, list) else [item]
+        policy = policy or self.policy
+        dropped = ()
+        with self._lock:
+            if policy == "block":
+                # A batch larger than the whole queue is let in once the queue is empty
+                while self._records and len(self._records) + len(records) > self.max_records:
+                    self._not_full.wait()
+            elif policy == "drop-oldest":
+                overflow = len(self._records) + len(records) - self.max_records
+                if overflow > 0:
+                    evict = min(overflow, len(self._records))
+                    dropped = [self._records.popleft() for _ in range(evict)]
+                    if overflow > evict:
+                        # The batch alone exceeds the queue: keep its newest records
+                        dropped += records[:overflow - evict]
+                        records = records[overflow - evict:]
+            else:
+                room = max(self.max_records - len(self._records), 0)
+                step = self._sample_step() if policy == "sample" else 1
+                kept = records[::step][:room] if step else []
+                if len(kept) < len(records):
+                    dropped = [r for i, r in enumerate(records) if not step or i % step or i // step >= room]
+                records = kept
+            self._records.extend(records)
+            if records:
+                self._not_empty.notify()
+        if dropped:
+            self._count_dropped(dropped, policy)
+        return len(records)
+
+    def _sample_step(self):
+        # Called with the lock held. The kept share falls linearly from 1 at
+        # the watermark to 0 at capacity: keep every step-th record (None: none)
+        watermark = self.sample_above * self.max_records
+        fill = len(self._records)
+        if fill <= watermark:
+            return 1
+        fraction = (self.max_records - fill) / max(self.max_records - watermark, 1)
+        return math.ceil(1 / fraction) if fraction > 0 else None
+
+    def _count_dropped(self, records, policy):
+        per_zone = collections.Counter(record.get("zone", "") for record in records)
+        for zone, count in per_zone.items():
+            ingest_dropped.inc(zone, policy, amount=count)
+        self.dropped += len(records)
+
+    def drain(self, max_records=5000, timeout=None, linger=0.0):
+        """
+        Removes and returns up to max_records queued records, oldest first,
+        waiting up to timeout seconds (forever if None) for the first one and
+        then up to linger seconds more for the batch to fill.
+        """
+        with self._lock:
+            if not self._records and not self._not_empty.wait_for(lambda: self._records, timeout):
+                return []
+            if linger > 0 and len(self._records) < max_records:
+                self._not_empty.wait_for(lambda: len(self._records) >= max_records, linger)
+            n = min(max_records, len(self._records))
+            popleft = self._records.popleft
+            batch = [popleft() for _ in range(n)]
+            self._not_full.notify_all()
+        ingest_batches.observe(len(batch))
+        return batch
+
+
+
+class PartitionedQueue:
+    """
+    IngestQueue split by zone, one partition per Pathway connector.
+
+    A record goes to partition crc32(zone) % n, so every zone's readings
+    stay in order on one connector. put() takes the same arguments as
+    IngestQueue.put and splits a batch into one put per partition; each
+    partition holds max_records / n records under the same overflow policy.
+    """
+
+    def __init__(self, partitions=1, max_records=100000, policy="drop-oldest", sample_above=0.5):
+        if partitions < 1:
+            raise ValueError(f"Need at least one ingest partition, not {partitions}")
+        self.partitions = [
+            IngestQueue(max(max_records // partitions, 1), policy, sample_above) for _ in range(partitions)
+        ]
+        self.max_records = max_records
+        self.policy = policy
+        self._zone_partition = {}
+
+    @property
+    def dropped(self):
+        return sum(q.dropped for q in self.partitions)
+
+    def qsize(self):
+        return sum(q.qsize() for q in self.partitions)
+
+    def partition(self, zone):
+        """Index of the partition that zone's readings go to."""
+        i = self._zone_partition.get(zone)
+        if i is None:
+            i = zlib.crc32(str(zone).encode()) % len(self.partitions)
+            if len(self._zone_partition) < 100000:
+                self._zone_partition[zone] = i
+        return i
+
+    def put(self, item, policy=None):
+        """Queues a record or a list of records on their zones' partitions; returns how many were accepted."""
+        if len(self.partitions) == 1:
+            return self.partitions[0].put(item, policy)
+        records = item if isinstance(item, list) else [item]
+        groups = [[] for _ in self.partitions]
+        partition = self.partition
+        for record in records:
+            groups[partition(record.get("zone", ""))].append(record)
+        return sum(q.put(group, policy) for q, group in zip(self.partitions, groups) if group)
+
+
+# ===============================
+# BULK READINGS (POST /ingest)
+# ===============================
+
+# Reading fields accepted by /ingest, mirroring stream.EnergySchema:
+# (name, kind, required). Loads and temperature are rounded to the schema's ints.
+READING_FIELDS = (
+    ("zone", "string", True),
+    ("meter_id", "string", False),
+    ("ts", "float", False),
+    ("timestamp", "string", False),
+    ("household_load", "float", True),
+    ("solar_generation", "float", True),
+    ("grid_load", "float", True),
+    ("temperature", "float", True),
+)
+NON_NEGATIVE = ("household_load", "solar_generation", "grid_load")
+# Readings whose ts is more than MAX_SKEW seconds before the time of ingestion,
+# or more than MAX_AHEAD seconds after it, are rejected (0 disables either
+# check). The future bound is tight: one reading ahead of the stream moves every
+# event-time window, the history rings and the segment store forward with it.
+MAX_SKEW = float(os.getenv("GRIDAI_INGEST_MAX_SKEW", "86400"))
+MAX_AHEAD = float(os.getenv("GRIDAI_INGEST_MAX_AHEAD", "60"))
+# Stand-in for a value that is present but not a number (slow parse paths only);
+# validation rejects it like any other non-finite value
+INVALID = float("-inf")
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json", "text/plain")
+CSV_TYPES = ("text/csv", "application/csv")
+ARROW_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+
+class UnsupportedFormat(ValueError):
+    """The body's content type is not NDJSON, CSV or Arrow IPC."""
+
+
+ingest_records = metrics.registry.register(metrics.Counter(
+    "gridai_ingest_records_total", "Readings received per ingestion source (http, socket, dir, broker), by outcome.",
+    labels=("source", "outcome"),
+))
+
+
+def _arrow_schema(pa):
+    types = {"string": pa.string(), "float": pa.float64()}
+    return pa.schema([(name, types[kind]) for name, kind, _ in READING_FIELDS])
+
+
+def _coerce(value, kind):
+    # Slow path only: one reading of a batch Arrow could not parse as a whole
+    if value is None:
+        return None
+    if kind == "string":
+        return value if isinstance(value, str) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return INVALID
+    return float(value)
+
+
+def _read_ndjson(body, pa):
+    """NDJSON → Arrow table; malformed lines or values become nulls (rejected later)."""
+    import pyarrow.json as pa_json
+
+    schema = _arrow_schema(pa)
+    try:
+        return pa_json.read_json(io.BytesIO(body), parse_options=pa_json.ParseOptions(
+            explicit_schema=schema, unexpected_field_behavior="ignore",
+        ))
+    except pa.ArrowInvalid:
+        pass
+    rows = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        rows.append(row if isinstance(row, dict) else {})
+    return pa.table({
+        name: pa.array([_coerce(row.get(name), kind) for row in rows], type=schema.field(name).type)
+        for name, kind, _ in READING_FIELDS
+    })
+
+
+def _read_csv(body, pa):
+    """CSV with a header row → Arrow table; unparseable values become nulls (rejected later)."""
+    import pyarrow.csv as pa_csv
+
+    schema = _arrow_schema(pa)
+    names = schema.names
+
+    def read(column_types):
+        return pa_csv.read_csv(io.BytesIO(body), convert_options=pa_csv.ConvertOptions(
+            column_types=column_types, include_columns=names, include_missing_columns=True,
+            strings_can_be_null=True,
+        ))
+
+    try:
+        return read({field.name: field.type for field in schema})
+    except pa.ArrowInvalid:
+        # Some value does not convert: read everything as text, convert per value
+        table = read({name: pa.string() for name in names})
+    columns = {}
+    for name, kind, _ in READING_FIELDS:
+        if kind == "float":
+            columns[name] = pa.array([_parse_float(v) for v in table[name].to_pylist()], type=pa.float64())
+        else:
+            columns[name] = table[name]
+    return pa.table(columns)
+
+
+def _parse_float(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return INVALID
+
+
+def _read_arrow(body, pa):
+    import pyarrow.ipc as ipc
+
+    try:
+        table = ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid:
+        table = ipc.open_file(pa.BufferReader(body)).read_all()
+    schema = _arrow_schema(pa)
+    columns = {}
+    for field in schema:
+        if field.name in table.column_names:
+            columns[field.name] = table[field.name].cast(field.type)
+        else:
+            columns[field.name] = pa.nulls(len(table), field.type)
+    return pa.table(columns)
+
+
+def parse_readings(body, content_type=None, now=None, max_skew=None, max_ahead=None):
+    """
+    Parses and validates a batch of readings (NDJSON, CSV or Arrow IPC).
+
+    Validation is one vectorised pass over the columns: required fields
+    present, numbers finite, loads non-negative, ts no more than max_skew
+    seconds before now and max_ahead after it (defaults MAX_SKEW and
+    MAX_AHEAD). Returns (records, rejected,
+    reasons): records are dicts with exactly the EnergySchema input fields,
+    ready for data_queue; reasons counts rejections per field. Raises
+    UnsupportedFormat for an unknown content type, ValueError for an
+    unreadable body.
+    """
+    # pyarrow (a Pathway dependency) is only loaded once readings are posted
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    content_type = (content_type or NDJSON_TYPES[0]).split(";")[0].strip().lower()
+    try:
+        if content_type in NDJSON_TYPES:
+            table = _read_ndjson(body, pa)
+        elif content_type in CSV_TYPES:
+            table = _read_csv(body, pa)
+        elif content_type in ARROW_TYPES:
+            table = _read_arrow(body, pa)
+        else:
+            raise UnsupportedFormat(
+                f"Unsupported content type '{content_type}' "
+                f"(expected one of {', '.join(NDJSON_TYPES + CSV_TYPES + ARROW_TYPES)})"
+            )
+    except (pa.ArrowException, OSError) as e:
+        raise ValueError(f"Unreadable body: {e}") from e
+
+    now = time.time() if now is None else now
+    max_skew = MAX_SKEW if max_skew is None else max_skew
+    max_ahead = MAX_AHEAD if max_ahead is None else max_ahead
+    n = len(table)
+    valid = np.ones(n, dtype=bool)
+    reasons = {}
+
+    def reject(name, bad):
+        count = int(np.count_nonzero(bad & valid))
+        if count:
+            reasons[name] = reasons.get(name, 0) + count
+            valid[bad] = False
+
+    for name, kind, required in READING_FIELDS:
+        column = table[name]
+        if kind == "float":
+            values = column.to_numpy(zero_copy_only=False).astype(np.float64)   # nulls → NaN
+            present = ~np.isnan(values)
+            reject(name, np.isinf(values) | (~present if required else False))
+            if name in NON_NEGATIVE:
+                reject(name, present & (values < 0))
+            if name == "ts":
+                reject(name, present & (values <= 0))
+                if max_skew > 0:
+                    reject(name, present & (values < now - max_skew))
+                if max_ahead > 0:
+                    reject(name, present & (values > now + max_ahead))
+        elif required:
+            reject(name, ~pc.fill_null(pc.greater(pc.utf8_length(column), 0), False).to_numpy(zero_copy_only=False))
+
+    accepted = table.filter(pa.array(valid))
+    m = len(accepted)
+    ts = accepted["ts"].to_numpy(zero_copy_only=False).astype(np.float64)
+    ts[np.isnan(ts)] = now
+    timestamp = accepted["timestamp"].to_pylist()
+    if any(t is None for t in timestamp):
+        # Local time, like the generator's datetime.now().isoformat()
+        local = ts + time.localtime(now).tm_gmtoff
+        derived = np.datetime_as_string(np.rint(local * 1e6).astype("datetime64[us]"), unit="us").tolist()
+        timestamp = [t if t is not None else d for t, d in zip(timestamp, derived)]
+    columns = {
+        "zone": accepted["zone"].to_pylist(),
+        "meter_id": pc.fill_null(accepted["meter_id"], "").to_pylist(),
+        "ts": ts.tolist(),
+        "timestamp": timestamp,
+    }
+    for name in ("household_load", "solar_generation", "grid_load", "temperature"):
+        columns[name] = np.rint(accepted[name].to_numpy(zero_copy_only=False)).astype(np.int64).tolist()
+    names = list(columns)
+    records = [dict(zip(names, row)) for row in zip(*columns.values())] if m else []
+    return records, n - m, reasons
+
+
+def ingest(queue, body, content_type=None, source="http"):
+    """
+    Validates a batch and enqueues the valid readings in one put. Returns
+    the acknowledgement: received / accepted / rejected counts, rejections
+    per field, and how many accepted readings the overflow policy dropped.
+    """
+    records, rejected, reasons = parse_readings(body, content_type)
+    queued = queue.put(records) if records else 0
+    ingest_records.inc(source, "accepted", amount=len(records))
+    if rejected:
+        ingest_records.inc(source, "rejected", amount=rejected)
+    return {
+        "received": len(records) + rejected,
+        "accepted": len(records),
+        "rejected": rejected,
+        "rejected_by_field": reasons,
+        "dropped": len(records) - queued,
+    }
@@ -0,0 +1,143 @@
+import math
+import time
+
+import numpy as np
+
+
+# Record fields in the order produced by SyntheticLoad.to_records
+FIELDS = ("timestamp", "ts", "zone", "meter_id", "household_load", "solar_generation", "grid_load", "temperature")
+
+
+def zone_names(count):
+    if count <= 26:
+        return [f"Zone {chr(ord('A') + i)}" for i in range(count)]
+    return [f"Zone {i:05d}" for i in range(count)]
+
+
+class SyntheticLoad:
+    """
+    Vectorised synthetic meter fleet for scale testing.
+
+    Every meter has its own base load, solar capacity and temperature
+    sensitivity; readings follow a diurnal curve (morning and evening
+    peaks, midday solar) with air-conditioning load rising with the zone's
+    temperature. Meters report round-robin so each one is sampled at
+    rate / (zones * meters_per_zone) Hz. Same seed, same fleet and noise.
+    """
+
+    def __init__(self, zones=3, meters_per_zone=1, rate=1.0, seed=None):
+        self.zones = zone_names(zones)
+        self.meters_per_zone = meters_per_zone
+        self.rate = rate
+        self.rng = np.random.default_rng(seed)
+
+        n = zones * meters_per_zone
+        self.meter_zone = np.repeat(np.arange(zones), meters_per_zone)
+        self.meter_ids = np.array([
+            f"{zone}-M{m:05d}" for zone in self.zones for m in range(meters_per_zone)
+        ], dtype=object)
+        self.zone_names = np.array(self.zones, dtype=object)
+
+        # Per-meter / per-zone characteristics
+        self.base_load = self.rng.uniform(60, 110, n)
+        self.solar_capacity = self.rng.uniform(30, 90, n)
+        self.ac_sensitivity = self.rng.uniform(1.5, 4.0, n)
+        self.commercial_load = self.rng.uniform(40, 80, n)
+        self.zone_temp_offset = self.rng.normal(0, 1.5, zones)
+        # Share of consumption each meter reports (< 1 once tampered with)
+        self.reported = np.ones(n)
+
+        self._cursor = 0
+        # Local-time offset so ISO timestamps match datetime.now().isoformat()
+        now = time.time()
+        self._utc_offset = time.localtime(now).tm_gmtoff
+
+    def tamper(self, fraction, factor=0.4):
+        """
+        Makes a random fraction of meters under-report from now on, as a
+        bypassed meter would: they record only `factor` of their load.
+        Returns the tampered meter ids.
+        """
+        n = len(self.meter_zone)
+        chosen = self.rng.choice(n, size=int(round(n * fraction)), replace=False)
+        self.reported[chosen] = factor
+        return self.meter_ids[chosen].tolist()
+
+    def batch(self, start_ts, end_ts, size):
+        """
+        Column arrays for `size` readings spread evenly over [start_ts, end_ts).
+        """
+        n = len(self.meter_zone)
+        meters = (self._cursor + np.arange(size)) % n
+        self._cursor = (self._cursor + size) % n
+        zones = self.meter_zone[meters]
+        ts = start_ts + (end_ts - start_ts) * np.arange(size) / max(size, 1)
+
+        hour = ((ts + self._utc_offset) % 86400) / 3600.0
+        rng = self.rng
+
+        # Zone temperature: daily swing peaking mid-afternoon
+        temperature = (
+            31 + 6 * np.sin(2 * math.pi * (hour - 9) / 24)
+            + self.zone_temp_offset[zones] + rng.normal(0, 0.5, size)
+        )
+
+        # Household: morning + evening peaks, plus AC above 28 °C
+        shape = (
+            0.55
+            + 0.25 * np.exp(-((hour - 8) ** 2) / 4)
+            + 0.45 * np.exp(-((hour - 20) ** 2) / 6)
+        )
+        ac = self.ac_sensitivity[meters] * np.clip(temperature - 28, 0, None)
+        household = self.base_load[meters] * shape + ac + rng.normal(0, 4, size)
+
+        # Solar: bell over daylight hours with cloud noise
+        daylight = np.clip(np.sin(math.pi * (hour - 6) / 12), 0, None)
+        clouds = np.clip(rng.normal(0.85, 0.15, size), 0.2, 1.0)
+        solar = self.solar_capacity[meters] * daylight * clouds
+
+        grid = household + self.commercial_load[meters] * shape - 0.5 * solar
+        household = household * self.reported[meters]
+        grid = grid * self.reported[meters]
+
+        return {
+            "ts": ts,
+            "zone": self.zone_names[zones],
+            "meter_id": self.meter_ids[meters],
+            "household_load": np.clip(household, 0, None).round().astype(np.int64),
+            "solar_generation": solar.round().astype(np.int64),
+            "grid_load": np.clip(grid, 0, None).round().astype(np.int64),
+            "temperature": temperature.round().astype(np.int64),
+        }
+
+    def to_records(self, cols):
+        """Batch columns → list of stream record dicts (one pass, no per-field work)."""
+        local = ((cols["ts"] + self._utc_offset) * 1e6).astype("datetime64[us]")
+        columns = [
+            np.datetime_as_string(local).tolist(),
+            cols["ts"].tolist(),
+            cols["zone"].tolist(),
+            cols["meter_id"].tolist(),
+            cols["household_load"].tolist(),
+            cols["solar_generation"].tolist(),
+            cols["grid_load"].tolist(),
+            cols["temperature"].tolist(),
+        ]
+        return [dict(zip(FIELDS, values)) for values in zip(*columns)]
+
+    def run(self, emit, batch_interval=0.1, duration=None):
+        """
+        Calls emit(records) with one batch every batch_interval seconds,
+        sized so the long-run rate matches self.rate. Runs for duration
+        seconds, or forever if None.
+        """
+        started = last = time.time()
+        emitted = 0
+        while duration is None or last - started < duration:
+            time.sleep(batch_interval)
+            now = time.time()
+            due = int((now - started) * self.rate) - emitted
+            if due > 0:
+                emit(self.to_records(self.batch(last, now, due)))
+                emitted += due
+            last = now
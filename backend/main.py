@@ -1,27 +1,235 @@
 import stream
+import dashboard
+import metrics
 import os
-from fastapi import FastAPI
+import json
+import asyncio
+import threading
+import numpy as np
+from fastapi import FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
-from weather import get_weather
-from prediction import predict_next_load
-from risk import calculate_risk
-from theft import detect_theft
-from sustainability import calculate_sustainability
-from map import get_map_data
+from broadcast import Broadcaster
+import weather
+import theft
+import ingest
+import sharedstate
+import map as map_layer
+from aggregates import window_aggregates
+from prediction import forecaster
+from history import query_history
+from geo import parse_bbox
+from map import encode_map_data
 
 from fastapi.middleware.cors import CORSMiddleware
 
 
+# Live push channel fed directly by the stream threads (see /ws/live, /sse/live)
+live_channel = Broadcaster()
+
+# standalone: run the stream and serve it (one process)
+# producer:   the same, and also publish every snapshot to shared memory
+# reader:     no stream; serve the producer's shared snapshot, so any number of
+#             worker processes (uvicorn --workers N) can serve one producer
+ROLE = os.getenv("GRIDAI_ROLE", "standalone")
+if ROLE not in ("standalone", "producer", "reader"):
+    raise ValueError(f"GRIDAI_ROLE must be standalone, producer or reader, not '{ROLE}'")
+SHM_NAME = os.getenv("GRIDAI_SHM_NAME", "gridai-snapshot")
+SHM_BYTES = int(os.getenv("GRIDAI_SHM_BYTES", str(16 * 1024 * 1024)))
+SHM_INTERVAL = float(os.getenv("GRIDAI_SHM_INTERVAL_MS", "50")) / 1000
+
+shared_reader = sharedstate.SnapshotReader(SHM_NAME) if ROLE == "reader" else None
+
+
+# Responses derived from a snapshot may be reused by clients for this long:
+# about one stream tick (the mock generator publishes once a second)
+CACHE_MAX_AGE = int(os.getenv("GRIDAI_CACHE_MAX_AGE", "1"))
+CACHE_CONTROL = f"max-age={CACHE_MAX_AGE}, must-revalidate" if CACHE_MAX_AGE > 0 else "no-cache"
+
+# Payload parts served by their own routes (encoded once per version, see dashboard.encoded_section)
+PAYLOAD_SECTIONS = ("live", "predictions", "risk", "alerts", "sustainability", "theft")
+
+
+def _on_snapshot(snapshot):
+    # Runs on the pipeline thread: only hands the tick to the dashboard
+    # builder, which publishes each dashboard it derives to the live channel
+    dashboard.view.submit(snapshot)
+
+
+# ── Versioned response bodies ─────────────────────────────────────────────────
+
+def _forecast_view(zones=None):
+    mape = forecaster.mape()
+    return {
+        "interval_seconds": forecaster.interval,
+        "mape": None if mape != mape else mape,
+        "zones": forecaster.forecast(zones),
+    }
+
+
+# Whole-territory views that are not part of the dashboard payload
+_VIEWS = {
+    "zones": lambda: stream.zone_store.latest(),
+    "aggregates": lambda: window_aggregates.latest(),
+    "forecast": _forecast_view,
+}
+
+
+def _encoded_view(current, name):
+    """A _VIEWS body as JSON bytes, built once per dashboard version and cached with it."""
+    key = "view." + name
+    body = current.sections.get(key)
+    if body is None:
+        body = current.sections[key] = dashboard.encode_json(_VIEWS[name]())
+    return body
+
+
+def _versioned(request, name=None):
+    """
+    The dashboard (name None), one of its PAYLOAD_SECTIONS or a _VIEWS body
+    for the current version as a ready Response: cached bytes with the
+    version's ETag, or a bodyless 304 when the client already has them.
+    """
+    if shared_reader is None:
+        current = dashboard.view.current()
+        if name is None:
+            body = current.body
+        elif name in _VIEWS:
+            body = _encoded_view(current, name)
+        else:
+            body = dashboard.encoded_section(current, name)
+    else:
+        snapshot = shared_reader.current()
+        if snapshot is None:
+            return _waiting()
+        current = snapshot
+        body = snapshot.sections["dashboard" if name is None else name]
+    headers = {"ETag": current.etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request, current.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ── Shared snapshot ───────────────────────────────────────────────────────────
+
+_published = [None]
+
+
+def _shared_sections():
+    # Producer: everything the readers serve, encoded once per dashboard version
+    current = dashboard.view.current()
+    if current.version == _published[0]:
+        return None
+    _published[0] = current.version
+    layer = map_layer.layer.current()
+    sections = {
+        "dashboard": current.body,
+        **{name: dashboard.encoded_section(current, name) for name in PAYLOAD_SECTIONS},
+        **{name: _encoded_view(current, name) for name in _VIEWS},
+        # The map layer as arrays aligned with geo.registry plus each zone's
+        # encoded feature, so readers answer viewport queries themselves
+        "map_version": str(layer.version).encode(),
+        "map_load": layer.load.tobytes(),
+        "map_solar": layer.solar.tobytes(),
+        "map_levels": layer.levels.tobytes(),
+        "map_theft": layer.theft.tobytes(),
+        "map_fragments": "\n".join(layer.fragments).encode(),
+    }
+    return current.version, current.etag, sections
+
+
+def _decode_map(sections):
+    return map_layer.MapSnapshot(
+        int(sections["map_version"]),
+        np.frombuffer(sections["map_load"], dtype=np.float64),
+        np.frombuffer(sections["map_solar"], dtype=np.float64),
+        np.frombuffer(sections["map_levels"], dtype=np.int8),
+        np.frombuffer(sections["map_theft"], dtype=np.int8),
+        None,
+        sections["map_fragments"].decode().split("\n"),
+        None,
+    )
+
+
+_DECODERS = {
+    "aggregates": lambda s: json.loads(s.sections["aggregates"]),
+    "forecast": lambda s: json.loads(s.sections["forecast"]),
+    "map": lambda s: _decode_map(s.sections),
+}
+# Reader: decoded sections of the current shared snapshot, (seq, {name: value})
+_decoded = (None, {})
+
+
+def _shared_value(name):
+    """A _DECODERS value of the producer's snapshot, decoded once per version; None until published."""
+    global _decoded
+    snapshot = shared_reader.current()
+    if snapshot is None:
+        return None
+    seq, cache = _decoded
+    if seq != snapshot.seq:
+        cache = {}
+        _decoded = (snapshot.seq, cache)
+    value = cache.get(name)
+    if value is None:
+        value = cache[name] = _DECODERS[name](snapshot)
+    return value
+
+
+def _waiting():
+    return JSONResponse({"error": "Waiting for the producer's first snapshot"}, status_code=503)
+
+
+def _producer_only():
+    return JSONResponse({"error": "Served by the producer process only (GRIDAI_ROLE=reader)"}, status_code=503)
+
+
+async def _follow_shared(interval):
+    # Reader: feed the live channel from the shared region instead of the stream
+    seq = None
+    while True:
+        current = await run_in_threadpool(shared_reader.current)
+        if current is not None and current.seq != seq:
+            seq = current.seq
+            live_channel.publish(current.sections["dashboard"].decode())
+        await asyncio.sleep(interval)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start the mock stream
+    live_channel.bind(asyncio.get_running_loop())
+    await weather.service.start()
+    if ROLE == "reader":
+        print(f"🚀 Serving the shared snapshot '{SHM_NAME}'...")
+        follower = asyncio.create_task(_follow_shared(SHM_INTERVAL))
+        yield
+        follower.cancel()
+        await weather.service.close()
+        return
+
+    # Startup: Start the mock stream and hook the push channel onto it
     print("🚀 Starting Data stream...")
+    dashboard.view.start(live_channel.publish)
+    stream.add_snapshot_listener(_on_snapshot)
     stream.start_stream()
+    writer, stop = None, threading.Event()
+    if ROLE == "producer":
+        writer = sharedstate.SnapshotWriter(SHM_NAME, SHM_BYTES)
+        threading.Thread(
+            target=writer.run, args=(_shared_sections, SHM_INTERVAL, stop), daemon=True, name="gridai-shm",
+        ).start()
+        print(f"📤 Publishing snapshots to shared memory '{SHM_NAME}'")
     yield
     # Shutdown
     print("🛑 Shutting down backend...")
+    if writer is not None:
+        stop.set()
+        writer.close()
+    await weather.service.close()
+    if stream.segment_store is not None:
+        stream.segment_store.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -33,7 +241,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets cross-origin clients read the validator and revalidate with If-None-Match
+    expose_headers=["ETag"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.registry.register(metrics.Gauge(
+    "gridai_live_subscribers", "Connected /ws/live and /sse/live clients.",
+    callback=lambda: live_channel.subscriber_count,
+))
 
 # ── API Routes ────────────────────────────────────────────────────────────────
 
@@ -49,69 +265,182 @@ def home():
         return FileResponse(static_index)
     return {"message": "GridAI Backend Running 🚀", "status": "online"}
 
+def _etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/dashboard")
+def get_dashboard(request: Request):
+    # Whole precomputed dashboard; unchanged polls get a bodyless 304
+    return _versioned(request)
+
 @app.get("/live-data")
-def get_live_data():
-    return stream.latest_data
+def get_live_data(request: Request):
+    return _versioned(request, "live")
 
 @app.get("/predictions")
-def get_predictions():
-    data = stream.latest_data
-    if not data or data.get("zone") == "Initializing...":
-        return {"error": "Stream initializing"}
-    return {
-        "current_load": data["grid_load"],
-        "predicted_load": data.get("predicted_load", 0),
-    }
+def get_predictions(request: Request):
+    return _versioned(request, "predictions")
+
+@app.get("/forecast")
+def get_forecast(request: Request, zone: list[str] | None = Query(None)):
+    # Next-interval forecast and rolling MAPE for every zone (or the requested ones)
+    if zone is None:
+        return _versioned(request, "forecast")
+    if shared_reader is not None:
+        shared = _shared_value("forecast")
+        if shared is None:
+            return _waiting()
+        return {**shared, "zones": {z: shared["zones"][z] for z in zone if z in shared["zones"]}}
+    return _forecast_view(zone)
 
 @app.get("/risk")
-def get_risk():
-    data = stream.latest_data
-    if not data or data.get("zone") == "Initializing...":
-        return {"error": "Stream initializing"}
-    risk_score = data.get("risk_score_pw", 0)
-    risk_level = "HIGH" if risk_score > 0.9 else "MEDIUM" if risk_score > 0.7 else "LOW"
-    return {
-        "risk_score": risk_score,
-        "risk_level": risk_level,
-    }
+def get_risk(request: Request):
+    return _versioned(request, "risk")
 
 @app.get("/alerts")
-def get_alerts():
-    data = stream.latest_data
-    if not data or data.get("zone") == "Initializing...":
-        return {"alerts": ["Initializing system..."]}
-    risk = calculate_risk(data["grid_load"])
-    alerts = []
-    if risk["risk_level"] == "HIGH":
-        alerts.append("🚨 High overload risk detected")
-    elif risk["risk_level"] == "MEDIUM":
-        alerts.append("⚠️ Moderate load risk")
-    return {"alerts": alerts}
+def get_alerts(request: Request):
+    return _versioned(request, "alerts")
 
 @app.get("/sustainability")
-def get_sustainability():
-    data = stream.latest_data
-    if not data or data.get("zone") == "Initializing...":
-        return {"error": "Stream initializing"}
-    result = calculate_sustainability(data["solar_generation"], data["grid_load"])
-    return result
+def get_sustainability(request: Request):
+    return _versioned(request, "sustainability")
 
 @app.get("/weather")
-def weather():
-    return get_weather()
+async def weather_data(city: str = "Delhi"):
+    # Served from the per-city cache; never blocks a worker on the upstream API
+    return await weather.service.get(city)
 
 @app.get("/map")
-def map_data():
-    return get_map_data()
+def map_data(bbox: str | None = None, zoom: int | None = None):
+    # Served from the per-tick map layer; viewport queries hit the spatial index
+    try:
+        bounds = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    snapshot = None
+    if shared_reader is not None:
+        snapshot = _shared_value("map")
+        if snapshot is None:
+            return _waiting()
+    return Response(encode_map_data(bounds, zoom, snapshot), media_type="application/json")
 
 @app.get("/theft")
-def theft_data():
-    data = stream.latest_data
-    if not data or data.get("zone") == "Initializing...":
-        return {"theft_risk": "LOW"}
-    grid_load = data.get("grid_load", 100)
-    prev_load = data.get("grid_load_avg", grid_load)
-    return detect_theft(grid_load, prev_load)
+def theft_data(request: Request):
+    return _versioned(request, "theft")
+
+@app.get("/theft/suspects")
+def theft_suspects(zone: str | None = None, level: str | None = None, limit: int = 100):
+    # Meters currently flagged by the streaming detector, strongest drop first
+    if shared_reader is not None:
+        return _producer_only()
+    return theft.monitor.suspects(zone, level, min(max(limit, 1), 10000))
+
+@app.get("/zones")
+def zones_data(request: Request):
+    # Latest reading of every zone from the per-zone store
+    return _versioned(request, "zones")
+
+@app.get("/history")
+def history_data(
+    zone: str,
+    metric: str | None = None,
+    start: float | None = Query(None, alias="from"),
+    end: float | None = Query(None, alias="to"),
+    points: int = 1000,
+    mode: str = "lttb",
+    resolution: str = "raw",
+):
+    # Time range of one zone's metric, downsampled server-side (lttb / minmax / avg);
+    # resolution 1m / 5m / 15m reads the windowed aggregates instead of raw readings
+    if shared_reader is not None:
+        return _producer_only()
+    result = query_history(zone, metric, start, end, points, mode, resolution)
+    if "error" in result:
+        # Unknown zone: 404; a metric, mode or resolution it cannot serve: 400
+        return JSONResponse(result, status_code=404 if "zones" in result else 400)
+    return result
+
+@app.get("/aggregates")
+def aggregates_data(request: Request, zone: str | None = None):
+    # Current window stats per resolution (avg/min/max/p95 of load and solar), per zone
+    if zone is None:
+        return _versioned(request, "aggregates")
+    if shared_reader is not None:
+        latest = _shared_value("aggregates")
+        if latest is None:
+            return _waiting()
+    else:
+        latest = window_aggregates.latest()
+    current = latest.get(zone)
+    if current is None:
+        return {"error": f"Unknown zone '{zone}'", "zones": list(latest)}
+    return current
+
+# Largest /ingest body accepted, in bytes
+INGEST_MAX_BYTES = int(os.getenv("GRIDAI_INGEST_MAX_BYTES", str(64 * 1024 * 1024)))
+
+@app.post("/ingest")
+async def ingest_readings(request: Request):
+    # Bulk meter readings (NDJSON or Arrow IPC), validated as one batch and queued in one put
+    if shared_reader is not None:
+        return _producer_only()
+    if int(request.headers.get("content-length") or 0) > INGEST_MAX_BYTES:
+        return JSONResponse({"error": f"Body larger than {INGEST_MAX_BYTES} bytes"}, status_code=413)
+    body = await request.body()
+    if len(body) > INGEST_MAX_BYTES:
+        return JSONResponse({"error": f"Body larger than {INGEST_MAX_BYTES} bytes"}, status_code=413)
+    try:
+        return await run_in_threadpool(ingest.ingest, stream.data_queue, body, request.headers.get("content-type"))
+    except ingest.UnsupportedFormat as e:
+        return JSONResponse({"error": str(e)}, status_code=415)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+# ── Live push channel ─────────────────────────────────────────────────────────
+# Pushes the /dashboard payload on every dashboard build: the whole payload
+# first, then the deltas since the version the client was last sent. Every
+# frame is encoded once on the dashboard builder thread (dashboard.LiveFrame);
+# a client further behind than the deltas kept gets the whole payload again.
+
+async def _live_frames():
+    sent = None
+    async for current in live_channel.subscribe():
+        if isinstance(current, dashboard.LiveFrame):
+            for frame in dashboard.catch_up(current, sent):
+                yield frame
+            sent = current.version
+        else:
+            yield current   # reader: the producer's whole payload
+
+@app.websocket("/ws/live")
+async def ws_live(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        async for frame in _live_frames():
+            await websocket.send_text(frame)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/sse/live")
+async def sse_live():
+    async def events():
+        async for frame in _live_frames():
+            yield f"data: {frame}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ── Serve React Frontend Static Files ─────────────────────────────────────────
 # The Vite build outputs to backend/static (see vite.config.ts outDir)
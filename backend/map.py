@@ -1,23 +1,30 @@
-import random
+import json
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+import geo
 import stream  # use live streaming data
+from risk import RISK_LEVELS, capacities, risk_level, score_batch
+import theft
+from theft import THEFT_LEVELS
 
 
-zones = [
-    {"name": "North Delhi", "lat": 28.7041, "lon": 77.1025},
-    {"name": "South Delhi", "lat": 28.5245, "lon": 77.1855},
-    {"name": "East Delhi", "lat": 28.6280, "lon": 77.2785},
-    {"name": "West Delhi", "lat": 28.6692, "lon": 77.0950},
-]
+# Zoom levels below DETAIL_ZOOM get aggregated cells instead of individual zones;
+# each web-map tile at that zoom is split into CELLS_PER_TILE x CELLS_PER_TILE cells
+DETAIL_ZOOM = 11
+CELLS_PER_TILE = 4
+# Upper bound on features in one response — denser views are aggregated
+MAX_FEATURES = 2000
 
+COLORS = np.array(["green", "orange", "red"])
 
-def calculate_risk(load, capacity=200):
-    ratio = load / capacity
 
-    if ratio > 0.9:
-        return "HIGH"
-    elif ratio > 0.7:
-        return "MEDIUM"
-    return "LOW"
+def calculate_risk(load, capacity=None, feeder=None):
+    if capacity is None:
+        capacity = capacities.capacity(feeder)
+    return risk_level(load / capacity)
 
 
 def get_color(risk):
@@ -28,39 +35,246 @@ def get_color(risk):
     return "green"
 
 
-def get_map_data():
-    data = []
+# One materialised map layer. Arrays are aligned with geo.registry and never
+# modified once published; features/fragments hold each zone's feature dict
+# and its JSON encoding, and changed the layer version in which each zone
+# last changed (for deltas, see changed_since).
+MapSnapshot = namedtuple(
+    "MapSnapshot",
+    ["version", "load", "solar", "levels", "theft", "features", "fragments", "changed"],
+)
+
+
+def _round(value, digits):
+    return None if value != value else round(value, digits)   # NaN → None
+
+
+class MapLayer:
+    """
+    The map, materialised once per stream update from real per-zone values.
+
+    refresh() pulls only the zones the zone store recorded since the last
+    refresh, recomputes their risk / theft / colour and re-encodes just their
+    features, then publishes a new immutable MapSnapshot. Requests read the
+    current snapshot and never compute per-zone values themselves.
+    """
+
+    def __init__(self, registry=None, zone_store=None):
+        self.registry = registry or geo.registry
+        self.zone_store = zone_store or stream.zone_store
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._zone_of_row = np.empty(0, dtype=np.int64)   # zone store row -> registry index (-1: unmapped)
+
+        n = len(self.registry)
+        self._capacity = np.array([capacities.capacity(z) for z in self.registry.names], dtype=np.float64)
+        nan = np.full(n, np.nan)
+        features = [self._feature(i, np.nan, np.nan, 0, 0) for i in range(n)]
+        fragments = [json.dumps(f) for f in features]
+        self._current = MapSnapshot(
+            0, nan, nan.copy(), np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int8), features, fragments,
+            np.zeros(n, dtype=np.int64),
+        )
+
+    def _feature(self, i, load, solar, level, theft):
+        reg = self.registry
+        renewable = solar / load * 100 if load > 0 else (np.nan if load != load else 0.0)
+        return {
+            "zone": reg.labels[i],
+            "lat": float(reg.lat[i]),
+            "lon": float(reg.lon[i]),
+            "load": _round(load, 2),
+            "solar": _round(solar, 2),
+            "renewable_percentage": _round(renewable, 2),
+            "risk": str(RISK_LEVELS[level]),
+            "theft_risk": str(THEFT_LEVELS[theft]),
+            "color": str(COLORS[level]),
+        }
+
+    def _map_rows(self, names):
+        # The zone store's row list only grows: map just the rows added since last time
+        seen = len(self._zone_of_row)
+        if len(names) > seen:
+            tail = np.fromiter(
+                (self.registry.index.get(name, -1) for name in names[seen:]),
+                dtype=np.int64, count=len(names) - seen,
+            )
+            self._zone_of_row = np.concatenate([self._zone_of_row, tail])
+        return self._zone_of_row
+
+    def refresh(self):
+        """Folds zone store changes into a new snapshot; returns the current snapshot."""
+        with self._lock:
+            rows, seq = self.zone_store.changed_since(self._seq)
+            if not len(rows):
+                return self._current
+            names, values = self.zone_store.latest_matrix(("grid_load", "solar_generation"))
+            zone_of_row = self._map_rows(names)
+            rows = rows[rows < min(len(values), len(zone_of_row))]
+            idx = zone_of_row[rows]
+            mapped = idx >= 0
+            rows, idx = rows[mapped], idx[mapped]
+            self._seq = seq
+            if not len(idx):
+                return self._current
+
+            prev = self._current
+            load, solar = prev.load.copy(), prev.solar.copy()
+            levels, suspected = prev.levels.copy(), prev.theft.copy()
+            load[idx], solar[idx] = values[rows, 0], values[rows, 1]
+            levels[idx] = score_batch(load[idx], self._capacity[idx])["levels"]
+            suspected[idx] = [theft.monitor.zone_level(self.registry.names[i]) for i in idx.tolist()]
+
+            features, fragments = list(prev.features), list(prev.fragments)
+            for i, l, s, lv, t in zip(idx.tolist(), load[idx].tolist(), solar[idx].tolist(),
+                                      levels[idx].tolist(), suspected[idx].tolist()):
+                features[i] = self._feature(i, l, s, lv, t)
+                fragments[i] = json.dumps(features[i])
+            changed = prev.changed.copy()
+            changed[idx] = prev.version + 1
+
+            self._current = MapSnapshot(
+                prev.version + 1, load, solar, levels, suspected, features, fragments, changed,
+            )
+            return self._current
+
+    def current(self):
+        return self._current
+
+
+layer = MapLayer()
+
+
+def _cell_keys(idx, zoom):
+    """One int64 key per zone (cell x in the high 32 bits, cell y in the low), and the cell size."""
+    size = 360.0 / (2 ** zoom) / CELLS_PER_TILE
+    cx = np.floor(geo.registry.lon[idx] / size).astype(np.int64)
+    cy = np.floor(geo.registry.lat[idx] / size).astype(np.int64)
+    return (cx << 32) | (cy & 0xFFFFFFFF), size
+
+
+def _cell_zoom(idx, zoom):
+    """Finest zoom (at most the requested one) that yields no more than MAX_FEATURES cells."""
+    zoom = DETAIL_ZOOM - 1 if zoom is None else max(min(zoom, DETAIL_ZOOM - 1), 0)
+    while zoom > 0 and len(np.unique(_cell_keys(idx, zoom)[0])) > MAX_FEATURES:
+        zoom -= 1
+    return zoom
+
+
+def _aggregate(snapshot, idx, zoom):
+    """Groups zones into grid cells of the given zoom; one feature per occupied cell."""
+    keys, size = _cell_keys(idx, zoom)
+    lon, lat = geo.registry.lon[idx], geo.registry.lat[idx]
+    load, solar = snapshot.load[idx], snapshot.solar[idx]
+    cells, inverse = np.unique(keys, return_inverse=True)
+    cell_x, cell_y = cells >> 32, (cells << 32) >> 32
+    count = np.bincount(inverse)
+
+    # Zones that have not reported yet count towards a cell but not its totals
+    total_load = np.bincount(inverse, np.nan_to_num(load))
+    total_solar = np.bincount(inverse, np.nan_to_num(solar))
+    mean_lon = np.bincount(inverse, lon) / count
+    mean_lat = np.bincount(inverse, lat) / count
+    cell_levels = np.zeros(len(cells), dtype=np.int8)
+    np.maximum.at(cell_levels, inverse, snapshot.levels[idx])
+    cell_theft = np.zeros(len(cells), dtype=np.int8)
+    np.maximum.at(cell_theft, inverse, snapshot.theft[idx])
+    renewable = np.divide(total_solar * 100, total_load, out=np.zeros(len(cells)), where=total_load > 0)
+
+    columns = zip(
+        cell_x.tolist(), cell_y.tolist(), count.tolist(), mean_lat.round(4).tolist(), mean_lon.round(4).tolist(),
+        total_load.round(1).tolist(), total_solar.round(1).tolist(), renewable.round(2).tolist(),
+        RISK_LEVELS[cell_levels].tolist(), THEFT_LEVELS[cell_theft].tolist(), COLORS[cell_levels].tolist(),
+    )
+    return [{
+        "zone": f"cell {zoom}/{cx}/{cy}",
+        "zones": n,
+        "lat": la,
+        "lon": lo,
+        "load": l,
+        "solar": s,
+        "renewable_percentage": r,
+        "risk": risk,
+        "theft_risk": t,
+        "color": color,
+        "bbox": [cx * size, cy * size, (cx + 1) * size, (cy + 1) * size],
+    } for cx, cy, n, la, lo, l, s, r, risk, t, color in columns]
+
+
+def get_map_data(bbox=None, zoom=None, snapshot=None):
+    """
+    Map features for the zones inside bbox (min_lon, min_lat, max_lon,
+    max_lat; whole territory if None) from the current map layer. At zoom
+    >= DETAIL_ZOOM (or with no zoom) each zone is one feature; zoomed out,
+    or when more than MAX_FEATURES zones are in view, zones are aggregated
+    into grid cells carrying total load/solar and the worst risk.
+    """
+    snapshot = snapshot or layer.current()
+    idx = geo.registry.query(bbox)
+    if (zoom is not None and zoom < DETAIL_ZOOM) or len(idx) > MAX_FEATURES:
+        return _aggregate(snapshot, idx, _cell_zoom(idx, zoom))
+    if bbox is None:
+        return snapshot.features
+    return [snapshot.features[i] for i in idx.tolist()]
+
 
-    live = stream.latest_data
+def changed_since(snapshot, version):
+    """Registry indices of the zones whose feature changed after layer version `version`."""
+    return np.flatnonzero(snapshot.changed > version)
 
-    for zone in zones:
-        # simulate different load for each zone
-        base_load = live.get("grid_load", random.randint(80, 150))
-        load = base_load + random.randint(-30, 30)
 
-        solar = live.get("solar_generation", random.randint(20, 60))
+def changed_features(snapshot, version):
+    """
+    The part of get_map_data(snapshot=snapshot) (whole territory) that
+    changed after layer version `version`: the changed zones' features, or
+    when the territory is aggregated, the cells holding them.
+    """
+    idx = changed_since(snapshot, version)
+    everything = geo.registry.query(None)
+    if len(everything) <= MAX_FEATURES or not len(idx):
+        return [snapshot.features[i] for i in idx.tolist()]
+    zoom = _cell_zoom(everything, None)
+    keys = np.unique(_cell_keys(idx, zoom)[0])
+    cells = {f"cell {zoom}/{cx}/{cy}" for cx, cy in zip((keys >> 32).tolist(), ((keys << 32) >> 32).tolist())}
+    return [f for f in _aggregate(snapshot, everything, zoom) if f["zone"] in cells]
 
-        renewable_percent = (solar / load) * 100 if load > 0 else 0
 
-        risk = calculate_risk(load)
-        color = get_color(risk)
+# Encoded viewport responses for the current layer version: (version, {(bbox, zoom): body})
+_encoded = (None, {})
+ENCODED_CACHE_SIZE = 256
 
-        theft_risk = random.choice(["LOW", "LOW", "MEDIUM"])
 
-        data.append({
-            "zone": zone["name"],
-            "lat": zone["lat"],
-            "lon": zone["lon"],
-            "load": load,
-            "solar": solar,
-            "renewable_percentage": round(renewable_percent, 2),
-            "risk": risk,
-            "theft_risk": theft_risk,
-            "color": color
-        })
+def encode_map_data(bbox=None, zoom=None, snapshot=None):
+    """
+    get_map_data as a JSON string, reusing each zone's pre-encoded feature.
+    Responses are cached until the layer's next version, so clients polling
+    the same viewport share one encoding.
+    """
+    global _encoded
+    snapshot = snapshot or layer.current()
+    version, cache = _encoded
+    if version != snapshot.version:
+        cache = {}
+        _encoded = (snapshot.version, cache)
+    key = (bbox, zoom)
+    body = cache.get(key)
+    if body is not None:
+        return body
 
-    return data
+    idx = geo.registry.query(bbox)
+    if (zoom is not None and zoom < DETAIL_ZOOM) or len(idx) > MAX_FEATURES:
+        body = json.dumps(_aggregate(snapshot, idx, _cell_zoom(idx, zoom)))
+    elif bbox is None:
+        body = "[" + ",".join(snapshot.fragments) + "]"
+    else:
+        body = "[" + ",".join([snapshot.fragments[i] for i in idx.tolist()]) + "]"
+    if len(cache) < ENCODED_CACHE_SIZE:
+        cache[key] = body
+    return body
 
 
 if __name__ == "__main__":
+    for i, zone in enumerate(geo.registry.names):
+        stream.zone_store.record(zone, 0.0, {"grid_load": 120 + 30 * i, "solar_generation": 40})
+    layer.refresh()
     print(get_map_data())
@@ -0,0 +1,173 @@
+import bisect
+import threading
+import time
+
+
+# Minimal Prometheus client: counters, gauges and histograms with labels,
+# rendered in the text exposition format at /metrics. Each observation is a
+# dict lookup, a bisect and a couple of additions under one lock.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, count in list(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, values)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge set explicitly, or computed at scrape time by a callback."""
+
+    def __init__(self, name, help, labels=(), callback=None):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.callback = callback
+        self._values = {}
+
+    def set(self, value, *label_values):
+        self._values[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self._values
+        if self.callback is not None:
+            values = {(): self.callback()}
+        for label_values, value in list(values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}    # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def observe_many(self, values, *label_values):
+        """observe() for a batch of values, taking the lock once."""
+        buckets = self.buckets
+        indices = [bisect.bisect_left(buckets, v) for v in values]
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(buckets) + 2)
+            for i in indices:
+                series[i] += 1
+            series[-1] += sum(values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for label_values, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _label_str(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_str(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ── Pipeline ──────────────────────────────────────────────────────────────────
+
+stage_latency = registry.register(Histogram(
+    "gridai_stage_latency_seconds",
+    "Time a record spent in each pipeline stage (queue: generation→dequeue, "
+    "pathway: dequeue→end of its Pathway commit, publish: commit→snapshot published, "
+    "end_to_end: generation→snapshot published).",
+    labels=("stage",),
+))
+records_total = registry.register(Counter(
+    "gridai_records_total", "Records emitted by the Pathway pipeline, per zone.", labels=("zone",),
+))
+queue_dropped = registry.register(Counter(
+    "gridai_queue_dropped_total", "Records discarded because a stream queue was full.", labels=("queue",),
+))
+snapshots_published = registry.register(Counter(
+    "gridai_snapshots_published_total", "Stream snapshots published to listeners.",
+))
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+
+http_latency = registry.register(Histogram(
+    "gridai_http_request_duration_seconds", "HTTP request latency per route.",
+    labels=("method", "route", "status"),
+))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_latency.observe(time.perf_counter() - start, scope["method"], path, status[0])
@@ -1,14 +1,201 @@
-import random
+import math
+import os
+import threading
+import time
 
-def predict_next_load(current_load):
+import numpy as np
+
+import metrics
+
+
+# Regression inputs per zone: bias, load now, load one interval ago,
+# temperature and hour-of-day (as a point on the unit circle)
+FEATURES = ("bias", "load", "load_lag1", "temperature", "hour_sin", "hour_cos")
+
+forecast_mape = metrics.registry.register(metrics.Gauge(
+    "gridai_forecast_mape", "Mean absolute percentage error of one-interval-ahead zone load forecasts.",
+))
+forecast_seconds = metrics.registry.register(metrics.Histogram(
+    "gridai_forecast_step_seconds", "Time to update and forecast every zone for one interval (one batched call).",
+))
+
+
+class LoadForecaster:
     """
-    Simple prediction: next load slightly higher or lower
+    Per-zone one-interval-ahead load forecaster.
+
+    Readings are averaged per zone over fixed intervals of event time. At the
+    end of each interval every zone's model is updated and re-forecast in one
+    vectorised call: a ridge regression on FEATURES fitted by recursive least
+    squares with exponential forgetting, so each zone keeps only a weight
+    vector and a k x k matrix and no history. The weights start from
+    persistence (next load = last load), which the ridge prior shrinks
+    towards, so a new zone forecasts its last load rather than near zero
+    while it has little data. Accuracy is tracked as an exponentially
+    weighted MAPE per zone.
     """
-    change = random.randint(-10, 20)
-    predicted = current_load + change
 
-    if predicted < 0:
-        predicted = 0
+    def __init__(self, interval=5.0, forgetting=0.99, ridge=10.0, max_zones=10000):
+        self.interval = interval
+        self.forgetting = forgetting
+        self.ridge = ridge
+        self.max_zones = max_zones
+        self._index = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self._interval_end = None
+        self._alloc(64)
+
+    def _alloc(self, size):
+        k = len(FEATURES)
+        old = getattr(self, "_w", None)
+        n = len(self._names)
+        persistence = np.zeros(k)
+        persistence[FEATURES.index("load")] = 1.0   # weight on load / scale, in scaled units
+        state = {
+            "_w": np.tile(persistence, (size, 1)),
+            "_P": np.tile(np.eye(k) / self.ridge, (size, 1, 1)),
+            "_sum_load": np.zeros(size),
+            "_sum_temp": np.zeros(size),
+            "_count": np.zeros(size),
+            "_load": np.full(size, np.nan),        # last interval's mean load
+            "_load_lag": np.full(size, np.nan),    # the one before
+            "_temp": np.full(size, np.nan),
+            "_scale": np.ones(size),
+            "_forecast": np.full(size, np.nan),    # prediction for the next interval
+            "_ape": np.full(size, np.nan),         # EWMA of absolute percentage error
+        }
+        for name, array in state.items():
+            if old is not None:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+
+    def _zone(self, zone):
+        i = self._index.get(zone)
+        if i is None:
+            if len(self._names) >= self.max_zones:
+                return None
+            i = len(self._names)
+            if i == len(self._w):
+                self._alloc(2 * i)
+            self._index[zone] = i
+            self._names.append(zone)
+        return i
+
+    def observe(self, zone, ts, load, temperature):
+        """
+        Adds one reading (O(1)); closes the interval first if ts is past it.
+        Returns the zone's current forecast for the next interval.
+        """
+        if self._interval_end is None:
+            self._interval_end = (math.floor(ts / self.interval) + 1) * self.interval
+        elif ts >= self._interval_end:
+            self.step(ts)
+        i = self._zone(zone)
+        if i is None:
+            return load
+        self._sum_load[i] += load
+        self._sum_temp[i] += temperature
+        self._count[i] += 1
+        forecast = self._forecast[i]
+        return load if forecast != forecast else round(float(forecast), 2)
+
+    def _features(self, load, lag, temp, hour, scale):
+        angle = np.full_like(load, 2 * math.pi * hour / 24)
+        return np.stack([
+            np.ones_like(load), load / scale, lag / scale, temp / 40.0, np.sin(angle), np.cos(angle),
+        ], axis=1)
+
+    def step(self, ts):
+        """Closes the current interval: updates every zone that reported and re-forecasts it."""
+        started = time.perf_counter()
+        with self._lock:
+            end = self._interval_end
+            n = len(self._names)
+            active = np.flatnonzero(self._count[:n] > 0)
+            if len(active):
+                self._update(active, end)
+            self._sum_load[:n] = self._sum_temp[:n] = self._count[:n] = 0
+            self._interval_end = (math.floor(ts / self.interval) + 1) * self.interval
+        forecast_seconds.observe(time.perf_counter() - started)
+        forecast_mape.set(self.mape())
+
+    def _update(self, i, end):
+        y = self._sum_load[i] / self._count[i]
+        temp = self._sum_temp[i] / self._count[i]
+        load, lag, prev_temp = self._load[i], self._load_lag[i], self._temp[i]
+        first = np.isnan(load)
+        self._scale[i[first]] = np.maximum(y[first], 1.0)
+        scale = self._scale[i]
+
+        # Accuracy of the forecast made one interval ago
+        predicted = self._forecast[i]
+        scored = ~np.isnan(predicted) & (y > 0)
+        ape = np.abs(predicted[scored] - y[scored]) / y[scored]
+        prev_ape = self._ape[i[scored]]
+        self._ape[i[scored]] = np.where(np.isnan(prev_ape), ape, prev_ape + 0.05 * (ape - prev_ape))
+
+        # RLS update on zones with a full previous feature row: x(t-1) → y(t)
+        hour = ((end - self.interval) % 86400) / 3600.0
+        fit = ~first & ~np.isnan(lag)
+        if fit.any():
+            j = i[fit]
+            x = self._features(load[fit], lag[fit], prev_temp[fit], hour - self.interval / 3600.0, scale[fit])
+            w, P = self._w[j], self._P[j]
+            Px = np.einsum("zij,zj->zi", P, x)
+            gain = Px / (self.forgetting + np.einsum("zi,zi->z", x, Px))[:, None]
+            error = y[fit] / scale[fit] - np.einsum("zi,zi->z", w, x)
+            self._w[j] = w + gain * error[:, None]
+            self._P[j] = (P - gain[:, :, None] * Px[:, None, :]) / self.forgetting
+
+        # Roll state forward and forecast the next interval
+        lag_now = np.where(first, y, load)
+        self._load_lag[i], self._load[i], self._temp[i] = lag_now, y, temp
+        x = self._features(y, lag_now, temp, hour, scale)
+        forecast = np.einsum("zi,zi->z", self._w[i], x) * scale
+        # Persistence until a zone has a fitted model
+        self._forecast[i] = np.where(fit, np.maximum(forecast, 0.0), y)
+
+    def forecast(self, zones=None):
+        """Next-interval forecast for every zone (or the given zones) as {zone: load}, one vectorised read."""
+        with self._lock:
+            n = len(self._names)
+            names = self._names[:n] if zones is None else [z for z in zones if z in self._index]
+            idx = np.arange(n) if zones is None else np.array([self._index[z] for z in names], dtype=np.int64)
+            values = self._forecast[idx].round(2).tolist()
+            ape = self._ape[idx].round(4).tolist()
+        return {
+            name: {"predicted_load": None if v != v else v, "mape": None if e != e else e}
+            for name, v, e in zip(names, values, ape)
+        }
+
+    def mape(self):
+        """Fleet-wide MAPE: mean of the zones' error averages (NaN before any forecast is scored)."""
+        ape = self._ape[:len(self._names)]
+        scored = ape[~np.isnan(ape)]
+        return round(float(scored.mean()), 4) if len(scored) else float("nan")
+
+    def predicted(self, zone):
+        i = self._index.get(zone)
+        if i is None or np.isnan(self._forecast[i]):
+            return None
+        return round(float(self._forecast[i]), 2)
+
+
+forecaster = LoadForecaster(
+    interval=float(os.getenv("GRIDAI_FORECAST_INTERVAL", "5")),
+    max_zones=int(os.getenv("GRIDAI_MAX_ZONES", "10000")),
+)
+
+
+def predict_next_load(current_load, zone=None):
+    """
+    Next-interval load for zone from the forecaster; the current load until
+    the zone's model has been fitted
+    """
+    predicted = forecaster.predicted(zone) if zone is not None else None
+    if predicted is None:
+        predicted = current_load
 
     return {
         "current_load": current_load,
@@ -18,5 +205,14 @@ def predict_next_load(current_load):
 
 # Test function
 if __name__ == "__main__":
-    result = predict_next_load(120)
-    print(result)
+    from loadgen import SyntheticLoad
+
+    # Two hours of a 20-zone fleet in 5 s intervals, fed as fast as possible
+    fleet = SyntheticLoad(zones=20, meters_per_zone=5, seed=1)
+    start = 1718000000.0
+    for k in range(1440):
+        cols = fleet.batch(start + 5 * k, start + 5 * (k + 1), 200)
+        for zone, ts, load, temp in zip(cols["zone"], cols["ts"], cols["grid_load"], cols["temperature"]):
+            forecaster.observe(zone, ts, load, temp)
+    print("MAPE:", forecaster.mape())
+    print(predict_next_load(120, "Zone A"))
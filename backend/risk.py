@@ -1,15 +1,94 @@
-def calculate_risk(load, capacity=200):
+import json
+import os
+
+import numpy as np
+
+HIGH_RATIO = 0.9
+MEDIUM_RATIO = 0.7
+RISK_LEVELS = np.array(["LOW", "MEDIUM", "HIGH"])
+
+
+class CapacityRegistry:
+    """
+    Per-feeder capacity limits (MW), loaded from a JSON config:
+    {"default": 200, "feeders": {"Zone A": 200, ...}}. Feeders without an
+    entry get the default.
+    """
+
+    def __init__(self, default=200.0, feeders=None):
+        self.default = float(default)
+        self.feeders = {name: float(mw) for name, mw in (feeders or {}).items()}
+        self._aligned_names = None
+        self._aligned = np.empty(0)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(config.get("default", 200), config.get("feeders", {}))
+
+    def capacity(self, feeder=None):
+        return self.feeders.get(feeder, self.default)
+
+    def capacities(self, names):
+        """
+        Capacity array aligned with names. Zone name lists only ever grow, so
+        when handed the same list again only the new tail is looked up.
+        """
+        cached = self._aligned
+        if names is not self._aligned_names or len(names) < len(cached):
+            cached = np.empty(0)
+        if len(names) > len(cached):
+            tail = np.fromiter(
+                (self.capacity(n) for n in names[len(cached):]), dtype=np.float64,
+                count=len(names) - len(cached),
+            )
+            cached = np.concatenate([cached, tail])
+        self._aligned_names, self._aligned = names, cached
+        return cached[:len(names)]
+
+
+def score_batch(loads, capacities):
+    """
+    Vectorised risk for many feeders at once.
+    Returns utilisation (load / capacity), headroom (MW) and level codes
+    (0 LOW, 1 MEDIUM, 2 HIGH; index into RISK_LEVELS).
+    """
+    loads = np.asarray(loads, dtype=np.float64)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    utilisation = loads / capacities
+    levels = (utilisation > MEDIUM_RATIO).astype(np.int8) + (utilisation > HIGH_RATIO)
+    return {
+        "utilisation": utilisation,
+        "headroom": capacities - loads,
+        "levels": levels,
+    }
+
+
+def risk_level(usage_ratio):
+    if usage_ratio > HIGH_RATIO:
+        return "HIGH"
+    elif usage_ratio > MEDIUM_RATIO:
+        return "MEDIUM"
+    return "LOW"
+
+
+capacities = CapacityRegistry.load(
+    os.getenv("GRIDAI_CAPACITY_FILE", os.path.join(os.path.dirname(__file__), "capacities.json"))
+)
+
+
+def calculate_risk(load, capacity=None, feeder=None):
     """
     Risk based on percentage of capacity used
     """
+    if capacity is None:
+        capacity = capacities.capacity(feeder)
     usage_ratio = load / capacity
-
-    if usage_ratio > 0.9:
-        level = "HIGH"
-    elif usage_ratio > 0.7:
-        level = "MEDIUM"
-    else:
-        level = "LOW"
+    level = risk_level(usage_ratio)
 
     return {
         "load": load,
@@ -23,3 +102,4 @@ def calculate_risk(load, capacity=200):
 if __name__ == "__main__":
     result = calculate_risk(180)
     print(result)
+    print(score_batch([120, 150, 190], capacities.capacities(["Zone A", "Zone B", "Zone C"])))
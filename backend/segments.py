@@ -0,0 +1,263 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from zonestore import METRICS
+
+
+# Column layout of every segment: one fixed-width, append-only file per column
+COLUMNS = {"ts": np.float64, "zone": np.uint32, **{m: np.float32 for m in METRICS}}
+
+segment_late = metrics.registry.register(metrics.Counter(
+    "gridai_segment_late_rows_total", "Readings older than the open segment's slot, by outcome.",
+    labels=("outcome",),
+))
+
+
+class SegmentStore:
+    """
+    Append-only, columnar on-disk store for stream readings.
+
+    Readings go into the segment for their time slot (segment_seconds wide),
+    one directory per segment holding one raw little-endian file per column.
+    Writes are buffered and flushed in batches; a segment is closed once the
+    stream moves past its slot, after which it is memory-mapped read-only
+    for queries and replays. Segments older than retention_seconds are deleted.
+    A late reading, for a slot before the open one, is appended to its own
+    slot's segment with the next flush (or dropped and counted if that slot is
+    already past retention).
+    """
+
+    def __init__(self, root, segment_seconds=3600, retention_seconds=7 * 86400,
+                 flush_rows=4096, flush_interval=1.0):
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._zone_ids = self._load_zones()
+        self._zone_names = {i: name for name, i in self._zone_ids.items()}
+
+        self._open_start = None    # slot start of the segment being written
+        self._files = {}
+        self._buffer = {name: [] for name in COLUMNS}
+        self._late = {}            # slot start (before the open one) -> column buffers
+        self._last_flush = time.monotonic()
+        self._mmaps = {}           # closed segment start -> {column: memmap}
+
+    # ── zones ─────────────────────────────────────────────────────────────
+
+    def _zones_path(self):
+        return os.path.join(self.root, "zones.json")
+
+    def _load_zones(self):
+        try:
+            with open(self._zones_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _zone_id(self, zone):
+        zid = self._zone_ids.get(zone)
+        if zid is None:
+            zid = self._zone_ids[zone] = len(self._zone_ids)
+            self._zone_names[zid] = zone
+            tmp = self._zones_path() + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._zone_ids, f)
+            os.replace(tmp, self._zones_path())
+        return zid
+
+    def zone_id(self, zone):
+        return self._zone_ids.get(zone)
+
+    def zone_name(self, zid):
+        return self._zone_names.get(int(zid))
+
+    # ── segments ──────────────────────────────────────────────────────────
+
+    def _slot(self, ts):
+        return int(ts // self.segment_seconds) * self.segment_seconds
+
+    def _segment_dir(self, start):
+        return os.path.join(self.root, f"seg-{start:012d}")
+
+    def segment_starts(self):
+        starts = []
+        for name in os.listdir(self.root):
+            if name.startswith("seg-"):
+                starts.append(int(name[4:]))
+        return sorted(starts)
+
+    def _roll(self, start):
+        """Closes the open segment (if any) and starts writing the one at slot start."""
+        self._flush_locked()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+        for name, p in self._column_paths(start).items():
+            self._files[name] = open(p, "ab")
+        self._mmaps.pop(start, None)
+        self._open_start = start
+        self._enforce_retention()
+
+    def _column_paths(self, start):
+        """{column: file path} of the segment at slot start, ready for appending."""
+        seg = self._segment_dir(start)
+        os.makedirs(seg, exist_ok=True)
+        paths = {name: os.path.join(seg, f"{name}.bin") for name in COLUMNS}
+
+        # Reopening after a crash: drop any partially written trailing row so
+        # every column file holds the same number of fixed-width records
+        rows = min(
+            (os.path.getsize(p) if os.path.exists(p) else 0) // np.dtype(COLUMNS[name]).itemsize
+            for name, p in paths.items()
+        )
+        for name, p in paths.items():
+            if os.path.exists(p):
+                os.truncate(p, rows * np.dtype(COLUMNS[name]).itemsize)
+        return paths
+
+    def _enforce_retention(self):
+        cutoff = time.time() - self.retention_seconds
+        for start in self.segment_starts():
+            if start + self.segment_seconds < cutoff and start != self._open_start:
+                self._mmaps.pop(start, None)
+                shutil.rmtree(self._segment_dir(start), ignore_errors=True)
+
+    # ── writes ────────────────────────────────────────────────────────────
+
+    def append(self, zone, ts, reading):
+        """Buffers one reading (dict of METRICS values); flushes in batches."""
+        with self._lock:
+            start = self._slot(ts)
+            if self._open_start is None or start > self._open_start:
+                self._roll(start)
+
+            buf = self._buffer
+            if start < self._open_start:
+                if start + self.segment_seconds < time.time() - self.retention_seconds:
+                    segment_late.inc("expired")
+                    return
+                buf = self._late.get(start)
+                if buf is None:
+                    buf = self._late[start] = {name: [] for name in COLUMNS}
+            buf["ts"].append(ts)
+            buf["zone"].append(self._zone_id(zone))
+            for m in METRICS:
+                value = reading.get(m)
+                buf[m].append(np.nan if value is None else value)
+
+            if (len(buf["ts"]) >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        self._flush_late()
+        if not self._buffer["ts"] or not self._files:
+            return
+        for name, dtype in COLUMNS.items():
+            f = self._files[name]
+            np.asarray(self._buffer[name], dtype=dtype).tofile(f)
+            f.flush()
+            self._buffer[name] = []
+
+    def _flush_late(self):
+        # Late readings are rare: each earlier segment is opened only for the
+        # flush, and its cached maps are dropped so reads see the new rows
+        late, self._late = self._late, {}
+        for start, buf in late.items():
+            for name, p in self._column_paths(start).items():
+                with open(p, "ab") as f:
+                    np.asarray(buf[name], dtype=COLUMNS[name]).tofile(f)
+            self._mmaps.pop(start, None)
+            segment_late.inc("written", amount=len(buf["ts"]))
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+            self._open_start = None
+
+    # ── reads ─────────────────────────────────────────────────────────────
+
+    def _map_segment(self, start, columns):
+        """{column: read-only memmap} of a segment, truncated to whole rows."""
+        cached = self._mmaps.get(start)
+        if cached is not None and all(c in cached for c in columns):
+            return cached
+
+        seg = self._segment_dir(start)
+        counts = {}
+        for name in columns:
+            path = os.path.join(seg, f"{name}.bin")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts[name] = size // np.dtype(COLUMNS[name]).itemsize
+        rows = min(counts.values())
+
+        mapped = {}
+        for name in columns:
+            if rows == 0:
+                mapped[name] = np.empty(0, dtype=COLUMNS[name])
+            else:
+                path = os.path.join(seg, f"{name}.bin")
+                mapped[name] = np.memmap(path, dtype=COLUMNS[name], mode="r", shape=(rows,))
+
+        # Closed segments never change again, so their maps can be reused
+        if start != self._open_start:
+            self._mmaps.setdefault(start, {}).update(mapped)
+        return mapped
+
+    def segments_between(self, start, end):
+        """Slot starts of segments that may hold readings in [start, end]."""
+        return [
+            s for s in self.segment_starts()
+            if s <= end and s + self.segment_seconds >= start
+        ]
+
+    def read(self, zone, metric, start, end):
+        """(ts, values) of one zone/metric within [start, end], in time order."""
+        zid = self._zone_ids.get(zone)
+        if zid is None:
+            return np.empty(0), np.empty(0, dtype=np.float32)
+
+        ts_parts, value_parts = [], []
+        for seg in self.segments_between(start, end):
+            cols = self._map_segment(seg, ("ts", "zone", metric))
+            ts = cols["ts"]
+            mask = (cols["zone"] == zid) & (ts >= start) & (ts <= end)
+            if mask.any():
+                ts_parts.append(ts[mask])
+                value_parts.append(cols[metric][mask])
+
+        if not ts_parts:
+            return np.empty(0), np.empty(0, dtype=np.float32)
+        ts, values = np.concatenate(ts_parts), np.concatenate(value_parts)
+        # Late and out-of-order readings are stored in arrival order
+        if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+            order = ts.argsort(kind="stable")
+            ts, values = ts[order], values[order]
+        return ts, values
+
+    def iter_segments(self, start=None, end=None):
+        """Yields {column: memmap} for every segment overlapping [start, end]."""
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        for seg in self.segments_between(start, end):
+            yield self._map_segment(seg, tuple(COLUMNS))
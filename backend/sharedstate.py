@@ -0,0 +1,256 @@
+"""
+Shared-memory snapshot for serving from several processes.
+
+One producer process (the one running the stream) writes pre-encoded
+sections of the current snapshot into a named shared-memory region; any
+number of API worker processes map the same region and serve from it.
+
+Region layout: a 64-byte header, then the data area.
+
+    header  magic u32 | layout u32 | seq u64 | length u64 | version u64 | capacity u64
+    data    index length u32 | index JSON | section bodies
+
+The index is {"version", "etag", "sections": {name: [offset, length]}} with
+offsets relative to the first body. Writes follow a seqlock: seq is made
+odd before the data area is touched and even again once it is complete. A
+reader copies the data area and keeps it only if seq was even and
+unchanged across the copy, otherwise it retries. Readers cache the last
+snapshot and only copy when seq has moved, so a request that finds nothing
+new costs one 8-byte read of shared memory.
+"""
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+
+MAGIC = 0x47524944          # "GRID"; zeroed when the producer retires the region
+LAYOUT = 1
+HEADER = struct.Struct("<IIQQQQ")
+HEADER_SIZE = 64
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+INDEX_LENGTH = struct.Struct("<I")
+
+# sections maps a section name to its encoded bytes
+SharedSnapshot = namedtuple("SharedSnapshot", ["seq", "version", "etag", "sections"])
+
+
+class SnapshotWriter:
+    """The producer side: owns the region and publishes snapshots into it."""
+
+    def __init__(self, name, capacity=16 << 20):
+        try:
+            # A region left behind by a producer that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.name = name
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT, 0, 0, 0, capacity)
+
+    def write(self, version, etag, sections):
+        """Publishes one snapshot; returns False (nothing written) if it does not fit the region."""
+        index, offset = {}, 0
+        for name, body in sections.items():
+            index[name] = [offset, len(body)]
+            offset += len(body)
+        head = json.dumps({"version": version, "etag": etag, "sections": index}).encode()
+        length = INDEX_LENGTH.size + len(head) + offset
+        if length > self.capacity:
+            return False
+
+        with self._lock:
+            buf = self.shm.buf
+            seq = self._seq + 1
+            SEQ.pack_into(buf, SEQ_OFFSET, seq)            # odd: write in progress
+            pos = HEADER_SIZE
+            INDEX_LENGTH.pack_into(buf, pos, len(head))
+            pos += INDEX_LENGTH.size
+            buf[pos:pos + len(head)] = head
+            pos += len(head)
+            for body in sections.values():
+                buf[pos:pos + len(body)] = body
+                pos += len(body)
+            HEADER.pack_into(buf, 0, MAGIC, LAYOUT, seq, length, version, self.capacity)
+            SEQ.pack_into(buf, SEQ_OFFSET, seq + 1)        # even: complete
+            self._seq = seq + 1
+        return True
+
+    def run(self, build, interval=0.05, stop=None):
+        """
+        Publishing loop (run it on its own thread): every interval seconds
+        calls build(), which returns (version, etag, sections) or None when
+        nothing changed, and writes the result.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                snapshot = build()
+                if snapshot is not None and not self.write(*snapshot):
+                    print(f"⚠️ Snapshot does not fit the {self.capacity}-byte shared region (GRIDAI_SHM_BYTES)")
+            except Exception as e:
+                print(f"⚠️ Shared snapshot publish failed: {e}")
+            stop.wait(interval)
+
+    def close(self):
+        """Retires the region (readers re-attach to the next producer's) and removes it."""
+        with self._lock:
+            HEADER.pack_into(self.shm.buf, 0, 0, LAYOUT, self._seq, 0, 0, self.capacity)
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SnapshotReader:
+    """
+    The API worker side: maps the region on first use and returns the
+    current snapshot, re-attaching if the producer restarts.
+    """
+
+    def __init__(self, name, retries=1000, recheck_interval=1.0):
+        self.name = name
+        self.retries = retries
+        self.recheck_interval = recheck_interval
+        self.shm = None
+        self._current = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _attach(self):
+        try:
+            if sys.version_info >= (3, 13):
+                shm = shared_memory.SharedMemory(name=self.name, track=False)
+            else:
+                shm = shared_memory.SharedMemory(name=self.name)
+                # Older versions register attached segments with the resource
+                # tracker, which would unlink the producer's region when this
+                # worker exits
+                resource_tracker.unregister(shm._name, "shared_memory")
+        except FileNotFoundError:
+            return None
+        magic, layout = struct.unpack_from("<II", shm.buf, 0)
+        if magic != MAGIC or layout != LAYOUT:
+            shm.close()
+            return None
+        return shm
+
+    def _detach(self):
+        if self.shm is not None:
+            try:
+                self.shm.close()
+            except BufferError:
+                pass   # a memoryview is still alive; dropped with the object
+            self.shm = None
+        self._current = None
+
+    def _replaced(self):
+        # The producer retired this region, or a new producer created another
+        # one under the same name (after a crash, without retiring this one)
+        if struct.unpack_from("<I", self.shm.buf, 0)[0] != MAGIC:
+            return True
+        now = time.monotonic()
+        if now - self._checked < self.recheck_interval:
+            return False
+        self._checked = now
+        try:
+            return os.stat(f"/dev/shm/{self.name.lstrip('/')}").st_ino != os.fstat(self.shm._fd).st_ino
+        except OSError:
+            return True
+
+    def current(self):
+        """The latest complete snapshot, or None while no producer has published one."""
+        with self._lock:
+            if self.shm is not None and self._replaced():
+                self._detach()
+            if self.shm is None:
+                self.shm = self._attach()
+                if self.shm is None:
+                    return None
+            buf = self.shm.buf
+            for _ in range(self.retries):
+                seq = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+                cached = self._current
+                if cached is not None and cached.seq == seq:
+                    return cached
+                if seq == 0:
+                    return None
+                if seq & 1:
+                    time.sleep(0)   # writer mid-update: yield and retry
+                    continue
+                length = HEADER.unpack_from(buf, 0)[3]
+                data = bytes(buf[HEADER_SIZE:HEADER_SIZE + length])
+                if SEQ.unpack_from(buf, SEQ_OFFSET)[0] != seq:
+                    continue
+                self._current = _decode(seq, data)
+                return self._current
+            return self._current   # writer kept busy: serve the last good snapshot
+
+    def seq(self):
+        """Cheap change check: the region's current seq (0 if not attached)."""
+        shm = self.shm
+        return SEQ.unpack_from(shm.buf, SEQ_OFFSET)[0] if shm is not None else 0
+
+
+def _decode(seq, data):
+    (head_length,) = INDEX_LENGTH.unpack_from(data, 0)
+    start = INDEX_LENGTH.size + head_length
+    index = json.loads(data[INDEX_LENGTH.size:start])
+    sections = {
+        name: data[start + offset:start + offset + length]
+        for name, (offset, length) in index["sections"].items()
+    }
+    return SharedSnapshot(seq, index["version"], index["etag"], sections)
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    # One writer publishing as fast as it can, four processes reading: every
+    # snapshot a reader accepts must be internally consistent
+    NAME = "gridai-selftest"
+
+    def read(n, results):
+        reader = SnapshotReader(NAME)
+        seen = torn = 0
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            snapshot = reader.current()
+            if snapshot is None:
+                continue
+            body = snapshot.sections["body"]
+            if body != bytes([snapshot.version % 251]) * len(body) or len(body) != 1000 + snapshot.version % 5000:
+                torn += 1
+            seen += 1
+        results.put((n, seen, torn))
+
+    # Readers start before the region exists (as API workers may), and
+    # before this process starts its resource tracker
+    results = multiprocessing.Queue()
+    readers = [multiprocessing.Process(target=read, args=(n, results)) for n in range(4)]
+    for p in readers:
+        p.start()
+    writer = SnapshotWriter(NAME, capacity=1 << 20)
+    version = 0
+    deadline = time.monotonic() + 3.2
+    while time.monotonic() < deadline:
+        version += 1
+        writer.write(version, str(version), {"body": bytes([version % 251]) * (1000 + version % 5000)})
+    for p in readers:
+        p.join()
+    writer.close()
+    print(f"{version} snapshots written")
+    while not results.empty():
+        n, seen, torn = results.get()
+        print(f"reader {n}: {seen} reads, {torn} torn")
@@ -0,0 +1,403 @@
+"""
+Ingestion sources that feed the pipeline's ingest queue from outside the
+process, next to POST /ingest. Each reads in bulk and hands whole chunks to
+ingest.parse_readings, so parsing and validation are columnar (Arrow) rather
+than per field. Enabled with GRIDAI_SOURCES, a comma-separated list of:
+
+    tcp://0.0.0.0:7070           NDJSON lines over TCP
+    unix:///tmp/gridai.sock      NDJSON lines over a Unix-domain socket
+    dir:///var/gridai/incoming   tail *.ndjson / *.jsonl / *.csv files in a directory
+    mqtt://broker:1883/meters/#  MQTT topic filter (needs paho-mqtt), NDJSON payloads
+    local://meters/#             the same over the in-process LocalBroker
+
+    python sources.py send tcp://127.0.0.1:7070 --rate 20000 --seconds 10   # synthetic gateway
+"""
+import abc
+import os
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import ingest
+
+
+# Bytes read per recv() / file read: one chunk is parsed as one batch
+CHUNK_BYTES = 1 << 20
+
+
+class Source(abc.ABC):
+    """A background reader that submits chunks of readings to an ingest queue."""
+
+    kind = "source"
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def submit(self, body, content_type="application/x-ndjson"):
+        """Parses one chunk and queues its valid readings (one put)."""
+        try:
+            return ingest.ingest(self.queue, body, content_type, source=self.kind)
+        except ValueError as e:
+            print(f"⚠️ {self.kind} source: unreadable chunk ({len(body)} bytes): {e}")
+            return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True, name=f"gridai-{self.kind}")
+        self._thread.start()
+        return self
+
+    @abc.abstractmethod
+    def run(self):
+        """Reads and submits chunks until stop(); runs on the source's thread."""
+
+    def stop(self):
+        self._stopped.set()
+
+
+# ===============================
+# SOCKETS
+# ===============================
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class SocketSource(Source):
+    """
+    NDJSON line-protocol listener on TCP ("host", port) or a Unix-domain
+    socket path. Each connection is read in CHUNK_BYTES reads; every read
+    is cut at its last newline and the complete lines parsed as one batch.
+    """
+
+    kind = "socket"
+
+    def __init__(self, queue, address):
+        super().__init__(queue)
+        self.address = address
+        source = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                pending = b""
+                while True:
+                    data = self.request.recv(CHUNK_BYTES)
+                    if not data:
+                        break
+                    data = pending + data
+                    cut = data.rfind(b"\n") + 1
+                    if cut:
+                        source.submit(data[:cut])
+                    pending = data[cut:]
+                if pending.strip():
+                    source.submit(pending)
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)   # stale socket from a previous run
+            self.server = _UnixServer(address, Handler)
+        else:
+            self.server = _TCPServer(address, Handler)
+
+    def run(self):
+        print(f"🔌 Socket source listening on {self.address}")
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        super().stop()
+        self.server.shutdown()
+        self.server.server_close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+# ===============================
+# DIRECTORY TAIL
+# ===============================
+
+FILE_TYPES = {".ndjson": "application/x-ndjson", ".jsonl": "application/x-ndjson", ".csv": "text/csv"}
+
+
+class DirectorySource(Source):
+    """
+    Tails every *.ndjson / *.jsonl / *.csv file in a directory: new files
+    are read from the start, growing files from where the last poll
+    stopped, up to the last complete line. A CSV file's header is kept and
+    put in front of each later chunk. Truncated or replaced files are
+    re-read from the start. A line longer than CHUNK_BYTES is skipped and
+    counted as rejected.
+    """
+
+    kind = "dir"
+
+    def __init__(self, queue, path, poll_interval=0.5):
+        super().__init__(queue)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._files = {}   # name -> [inode, offset, csv header, skipping an oversized line]
+
+    def run(self):
+        print(f"📂 Directory source tailing {self.path}")
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                print(f"⚠️ Directory source: {e}")
+            self._stopped.wait(self.poll_interval)
+
+    def poll(self):
+        """Reads whatever was appended since the last poll; returns the bytes consumed."""
+        consumed = 0
+        for entry in sorted(os.scandir(self.path), key=lambda e: e.name):
+            content_type = FILE_TYPES.get(os.path.splitext(entry.name)[1].lower())
+            if content_type is None or not entry.is_file():
+                continue
+            stat = entry.stat()
+            state = self._files.get(entry.name)
+            if state is None or state[0] != stat.st_ino or stat.st_size < state[1]:
+                state = self._files[entry.name] = [stat.st_ino, 0, b"", False]
+            if stat.st_size > state[1]:
+                consumed += self._read(entry.path, state, content_type)
+        return consumed
+
+    def _read(self, path, state, content_type):
+        consumed = 0
+        with open(path, "rb") as f:
+            f.seek(state[1])
+            while True:
+                data = f.read(CHUNK_BYTES)
+                if state[3]:
+                    # Discarding an oversized line up to its newline, which may
+                    # be chunks (or polls) away
+                    end = data.find(b"\n") + 1
+                    state[1] += end or len(data)
+                    consumed += end or len(data)
+                    if end:
+                        state[3] = False
+                        ingest.ingest_records.inc(self.kind, "rejected")
+                        print(f"⚠️ Directory source: skipped a line over {CHUNK_BYTES} bytes in {path}")
+                    elif len(data) < CHUNK_BYTES:
+                        break
+                    f.seek(state[1])
+                    continue
+                cut = data.rfind(b"\n") + 1
+                if not cut:
+                    if len(data) == CHUNK_BYTES:
+                        state[3] = True   # a whole chunk without a newline
+                        f.seek(state[1])
+                        continue
+                    break   # no complete line yet
+                chunk = data[:cut]
+                if content_type == "text/csv":
+                    if state[1] == 0:
+                        header_end = chunk.find(b"\n") + 1
+                        state[2] = chunk[:header_end]
+                    else:
+                        chunk = state[2] + chunk
+                state[1] += cut
+                consumed += cut
+                if chunk.strip() and chunk != state[2]:
+                    self.submit(chunk, content_type)
+                if len(data) < CHUNK_BYTES:
+                    break
+                f.seek(state[1])
+        return consumed
+
+
+# ===============================
+# MQTT-STYLE BROKERS
+# ===============================
+
+def topic_matches(topic_filter, topic):
+    """MQTT topic filter matching: '+' matches one level, a trailing '#' any number."""
+    parts, levels = topic_filter.split("/"), topic.split("/")
+    for i, part in enumerate(parts):
+        if part == "#":
+            return True
+        if i >= len(levels) or (part != "+" and part != levels[i]):
+            return False
+    return len(parts) == len(levels)
+
+
+class LocalBroker:
+    """
+    In-process stand-in for an MQTT broker, with the same subscribe /
+    publish interface as MqttBroker. Delivery is synchronous, on the
+    publisher's thread.
+    """
+
+    def __init__(self):
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic_filter, callback):
+        """Calls callback(topic, payload) for every message published on a matching topic."""
+        with self._lock:
+            self._subscriptions = self._subscriptions + [(topic_filter, callback)]
+
+    def publish(self, topic, payload):
+        for topic_filter, callback in self._subscriptions:
+            if topic_matches(topic_filter, topic):
+                callback(topic, payload)
+
+
+class MqttBroker:
+    """subscribe / publish over a real MQTT broker (optional dependency: paho-mqtt)."""
+
+    def __init__(self, host, port=1883, client_id=""):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError as e:
+            raise RuntimeError("mqtt:// sources need paho-mqtt (pip install paho-mqtt)") from e
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        else:
+            self.client = mqtt.Client(client_id=client_id)
+        self._filters = []
+        self.client.on_connect = self._on_connect
+        self.client.connect(host, port)
+        self.client.loop_start()
+
+    def _on_connect(self, client, *args):
+        # (Re)subscribe on every connect, so subscriptions survive reconnects
+        for topic_filter in self._filters:
+            client.subscribe(topic_filter)
+
+    def subscribe(self, topic_filter, callback):
+        self._filters.append(topic_filter)
+        self.client.message_callback_add(topic_filter, lambda client, userdata, msg: callback(msg.topic, msg.payload))
+        self.client.subscribe(topic_filter)
+
+    def publish(self, topic, payload):
+        self.client.publish(topic, payload)
+
+
+# Broker for local:// sources and in-process publishers
+local_broker = LocalBroker()
+
+
+class BrokerSource(Source):
+    """
+    Subscribes to an MQTT-style topic filter; each payload is NDJSON (one
+    or more readings). Payloads are only buffered on delivery and parsed
+    together every flush_interval seconds, or sooner once CHUNK_BYTES
+    have accumulated.
+    """
+
+    kind = "broker"
+
+    def __init__(self, queue, broker, topic_filter, flush_interval=0.05):
+        super().__init__(queue)
+        self.broker = broker
+        self.topic_filter = topic_filter
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+
+    def on_message(self, topic, payload):
+        if not payload.endswith(b"\n"):
+            payload += b"\n"
+        with self._lock:
+            self._buffer.append(payload)
+            self._size += len(payload)
+            if self._size >= CHUNK_BYTES:
+                self._full.set()
+
+    def run(self):
+        print(f"📡 Broker source subscribed to '{self.topic_filter}'")
+        self.broker.subscribe(self.topic_filter, self.on_message)
+        while not self._stopped.is_set():
+            self._full.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            payloads, self._buffer, self._size = self._buffer, [], 0
+            self._full.clear()
+        if payloads:
+            self.submit(b"".join(payloads))
+
+
+# ===============================
+# CONFIGURATION
+# ===============================
+
+def source_from_spec(spec, queue):
+    """A Source for one GRIDAI_SOURCES entry (see the module docstring); ValueError if malformed."""
+    spec = spec.strip()
+    scheme, _, rest = spec.partition("://")
+    if scheme in ("mqtt", "local"):
+        # Split by hand: urlparse would take the "#" of a topic filter for a fragment
+        if scheme == "local":
+            return BrokerSource(queue, local_broker, rest.strip("/") or "#")
+        location, _, topic = rest.partition("/")
+        if not topic:
+            raise ValueError(f"mqtt source needs a topic filter: '{spec}'")
+        broker = urlparse("//" + location)
+        return BrokerSource(queue, MqttBroker(broker.hostname, broker.port or 1883), topic)
+
+    url = urlparse(spec)
+    if url.scheme == "tcp":
+        if not url.port:
+            raise ValueError(f"tcp source needs a port: '{spec}'")
+        return SocketSource(queue, (url.hostname or "0.0.0.0", url.port))
+    if url.scheme == "unix":
+        return SocketSource(queue, url.path)
+    if url.scheme == "dir":
+        interval = parse_qs(url.query).get("poll", ["0.5"])[0]
+        return DirectorySource(queue, url.path, poll_interval=float(interval))
+    raise ValueError(f"Unknown ingestion source '{spec}' (expected tcp://, unix://, dir://, mqtt:// or local://)")
+
+
+def start_sources(queue, specs):
+    """Starts a source for every comma-separated spec; returns them."""
+    sources = [source_from_spec(spec, queue) for spec in specs.split(",") if spec.strip()]
+    for source in sources:
+        source.start()
+    return sources
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from loadgen import SyntheticLoad
+
+    parser = argparse.ArgumentParser(description="Ingestion source tools.")
+    parser.add_argument("command", choices=["send"])
+    parser.add_argument("target", help="tcp://host:port or unix:///path")
+    parser.add_argument("--rate", type=float, default=10000, help="readings per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--zones", type=int, default=20)
+    parser.add_argument("--meters", type=int, default=10)
+    args = parser.parse_args()
+
+    url = urlparse(args.target)
+    if url.scheme == "unix":
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(url.path)
+    else:
+        conn = socket.create_connection((url.hostname, url.port))
+
+    generator = SyntheticLoad(zones=args.zones, meters_per_zone=args.meters, rate=args.rate, seed=1)
+    sent = 0
+
+    def emit(records):
+        global sent
+        conn.sendall("".join(json.dumps(r) + "\n" for r in records).encode())
+        sent += len(records)
+
+    started = time.perf_counter()
+    generator.run(emit, duration=args.seconds)
+    conn.close()
+    print(f"sent {sent} readings in {time.perf_counter() - started:.1f} s")
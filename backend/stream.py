@@ -1,15 +1,34 @@
+import functools
+import operator
 import threading
 import time
 import random
 import queue
 import os
+from collections import namedtuple
 from datetime import datetime
 
+import aggregates
+import metrics
+import theft
+from aggregates import window_aggregates
+from prediction import forecaster
+from ingest import PartitionedQueue
+from risk import capacities
+from zonestore import ZoneStore
+from segments import SegmentStore
+
 # Suppress Pathway's web dashboard (not needed in production)
 os.environ["PATHWAY_DASHBOARD_ENABLED"] = "false"
 
-# Global variable to store latest data safely
-latest_data = {
+# One published view of the stream: data holds the latest reading's fields, version
+# increases by one per publish and source_ts is the epoch ts of the reading it
+# was built from. Published by swapping the module-level latest_snapshot
+# reference and never mutated afterwards, so a reader that takes the
+# reference once has a consistent view without locking.
+Snapshot = namedtuple("Snapshot", ["version", "source_ts", "data"])
+
+latest_snapshot = Snapshot(0, None, {
     "timestamp": datetime.now().isoformat(),
     "zone": "Initializing...",
     "household_load": 0,
@@ -24,17 +43,113 @@ latest_data = {
     "renewable_percent": 0,
 
     "pathway_status": "Starting..."
-}
+})
 
+# Serialises the compare-and-swap in publish_snapshot (never held by readers)
 data_lock = threading.Lock()
 
-ZONES = ["Zone A", "Zone B", "Zone C"]
+ZONES = ["Zone A", "Zone B", "Zone C", "Zone D"]
+
+# Per-zone latest reading + bounded ring-buffer history, fed from Pathway output
+zone_store = ZoneStore(
+    capacity=int(os.getenv("GRIDAI_HISTORY_CAPACITY", "3600")),
+    max_zones=int(os.getenv("GRIDAI_MAX_ZONES", "10000")),
+)
+
+# On-disk columnar segment store for every processed reading (GRIDAI_SEGMENT_DIR="" disables)
+_segment_dir = os.getenv("GRIDAI_SEGMENT_DIR", os.path.join(os.path.dirname(__file__), "data", "segments"))
+segment_store = SegmentStore(
+    _segment_dir,
+    segment_seconds=int(os.getenv("GRIDAI_SEGMENT_SECONDS", "3600")),
+    retention_seconds=int(float(os.getenv("GRIDAI_SEGMENT_RETENTION_DAYS", "7")) * 86400),
+) if _segment_dir else None
+
+# Pathway engine worker threads (PATHWAY_THREADS): keyed operators — the
+# per-zone windows and per-meter theft state — are sharded across them
+PATHWAY_WORKERS = int(os.getenv("GRIDAI_PATHWAY_WORKERS", "1"))
+# Input partitions by zone, each fed into the engine by its own connector
+INGEST_PARTITIONS = int(os.getenv("GRIDAI_INGEST_PARTITIONS", str(PATHWAY_WORKERS)))
+
+# Queue: producers → Pathway connectors, bounded in records and partitioned by
+# zone; when full the overflow policy (block / drop-oldest / drop-newest /
+# sample) decides what is dropped
+data_queue = PartitionedQueue(
+    partitions=INGEST_PARTITIONS,
+    max_records=int(os.getenv("GRIDAI_INGEST_QUEUE_RECORDS", "100000")),
+    policy=os.getenv("GRIDAI_INGEST_OVERFLOW", "drop-oldest"),
+    sample_above=float(os.getenv("GRIDAI_INGEST_SAMPLE_ABOVE", "0.5")),
+)
+# Records handed to Pathway per connector commit, and the engine-side backlog
+# beyond which the connector stops draining (so overflow happens in data_queue)
+CONNECTOR_BATCH = int(os.getenv("GRIDAI_CONNECTOR_BATCH", "5000"))
+# Seconds a commit may wait for its batch to fill: fewer, larger engine time steps
+CONNECTOR_LINGER = float(os.getenv("GRIDAI_CONNECTOR_LINGER_MS", "50")) / 1000
+CONNECTOR_BACKLOG = int(os.getenv("GRIDAI_CONNECTOR_BACKLOG", "20000"))
+
+# Queue: raw generator → latest_snapshot (so the API always has fresh raw data)
+latest_update_queue = queue.Queue(maxsize=1)
 
-# Queue: raw generator → Pathway connector
-data_queue = queue.Queue(maxsize=500)
+metrics.registry.register(metrics.Gauge(
+    "gridai_theft_suspects", "Meters currently flagged by the theft detector.", callback=lambda: len(theft.monitor),
+))
+metrics.registry.register(metrics.Gauge(
+    "gridai_data_queue_depth", "Records waiting in data_queue.",
+    callback=data_queue.qsize,
+))
 
-# Queue: raw generator → latest_data snapshot (so the API always has fresh raw data)
-latest_update_queue = queue.Queue(maxsize=1)
+# Wall clock for stage timestamps (on_update's 'time' argument shadows the module)
+_clock = time.time
+_row_ts = operator.itemgetter("ts")
+
+# Rows emitted by the Pathway pipeline since start (read by replay / benchmarks)
+processed_count = 0
+
+# Set once the Pathway engine is running and consuming data_queue
+pipeline_ready = threading.Event()
+
+# Callbacks fired with every newly published snapshot (live push channel etc.)
+_snapshot_listeners = []
+
+
+# Callbacks fired with every row the Pathway pipeline emits (instrumentation)
+_row_listeners = []
+
+
+def add_row_listener(callback):
+    """Registers callback(row) to run for every processed Pathway row."""
+    _row_listeners.append(callback)
+
+
+def add_snapshot_listener(callback):
+    """Registers callback(snapshot) to run after every published Snapshot."""
+    _snapshot_listeners.append(callback)
+
+
+def publish_snapshot(fields, source_ts):
+    """
+    Publishes a snapshot with fields replacing those of the current one.
+    The new data is built off-lock; data_lock only covers the check that
+    no other writer published meanwhile (else it rebuilds) and the swap.
+    """
+    global latest_snapshot
+    while True:
+        base = latest_snapshot
+        snapshot = Snapshot(base.version + 1, source_ts, {**base.data, **fields})
+        with data_lock:
+            if latest_snapshot is base:
+                latest_snapshot = snapshot
+                break
+    _notify_snapshot(snapshot)
+    return snapshot
+
+
+def _notify_snapshot(snapshot):
+    metrics.snapshots_published.inc()
+    for callback in _snapshot_listeners:
+        try:
+            callback(snapshot)
+        except Exception as e:
+            print(f"⚠️ Snapshot listener failed: {e}")
 
 
 # ===============================
@@ -51,14 +166,19 @@ def start_stream():
     gen_thread = threading.Thread(target=run_generator_loop, daemon=True)
     gen_thread.start()
 
-    # 2. Latest-data snapshot updater — keeps latest_data fresh from raw data
+    # 2. Latest-data snapshot updater — keeps latest_snapshot fresh from raw data
     latest_thread = threading.Thread(target=run_latest_data_updater_loop, daemon=True)
     latest_thread.start()
 
-    # 3. Pathway pipeline — processes data_queue and enriches latest_data
+    # 3. Pathway pipeline — processes data_queue and enriches latest_snapshot
     pw_thread = threading.Thread(target=pathway_worker, daemon=True)
     pw_thread.start()
 
+    # 4. External ingestion sources (sockets, tailed directory, broker) → data_queue
+    if SOURCES:
+        from sources import start_sources
+        start_sources(data_queue, SOURCES)
+
     print("✅ Background streaming system launched.")
 
 
@@ -66,14 +186,46 @@ def start_stream():
 # MOCK DATA GENERATOR
 # ===============================
 
+# "random": one uniform-random reading per second across ZONES (default)
+# "synthetic": loadgen.SyntheticLoad fleet emitting vectorised batches at a target rate
+# "off": no generator — readings only come from /ingest and GRIDAI_SOURCES
+GENERATOR_MODE = os.getenv("GRIDAI_GENERATOR", "random")
+
+# External ingestion sources, comma-separated (see sources.py): tcp://, unix://, dir://, mqtt://, local://
+SOURCES = os.getenv("GRIDAI_SOURCES", "")
+
+
+def _push_latest(q, item, name):
+    """Non-blocking put that discards the oldest queued item when q is full."""
+    try:
+        q.put(item, block=False)
+    except queue.Full:
+        try:
+            dropped = q.get_nowait()
+            metrics.queue_dropped.inc(name, amount=len(dropped) if isinstance(dropped, list) else 1)
+            q.put(item, block=False)
+        except Exception:
+            pass
+
+
 def run_generator_loop():
-    """Generates mock energy readings every second and pushes to both queues."""
+    """Generates mock energy readings and pushes them to both queues."""
+    if GENERATOR_MODE == "synthetic":
+        return run_synthetic_generator_loop()
+    if GENERATOR_MODE == "off":
+        print("⚡ Data generator disabled (GRIDAI_GENERATOR=off).")
+        return
+
     print("⚡ Raw data generator started.")
 
     while True:
+        now = time.time()
+        zone = random.choice(ZONES)
         data = {
-            "timestamp": datetime.now().isoformat(),
-            "zone": random.choice(ZONES),
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "ts": now,
+            "zone": zone,
+            "meter_id": zone,
             "household_load": random.randint(50, 150),
             "solar_generation": random.randint(20, 80),
             "grid_load": random.randint(80, 200),
@@ -81,41 +233,74 @@ def run_generator_loop():
         }
 
         # Push to Pathway connector queue
-        try:
-            data_queue.put(data, block=False)
-        except queue.Full:
-            try:
-                data_queue.get_nowait()
-                data_queue.put(data, block=False)
-            except Exception:
-                pass
+        data_queue.put(data)
 
         # Push to snapshot updater queue
-        try:
-            latest_update_queue.put(data, block=False)
-        except queue.Full:
-            try:
-                latest_update_queue.get_nowait()
-                latest_update_queue.put(data, block=False)
-            except Exception:
-                pass
+        _push_latest(latest_update_queue, data, "latest")
 
         time.sleep(1)
 
 
+def run_synthetic_generator_loop():
+    """
+    High-rate synthetic fleet (GRIDAI_GEN_ZONES, GRIDAI_GEN_METERS, GRIDAI_GEN_RATE
+    records/sec, GRIDAI_GEN_SEED). Each batch goes onto data_queue in one put.
+    GRIDAI_GEN_TAMPER (a fraction) makes that share of meters start
+    under-reporting after GRIDAI_GEN_TAMPER_AFTER seconds, to exercise theft detection.
+    """
+    from loadgen import SyntheticLoad
+
+    generator = SyntheticLoad(
+        zones=int(os.getenv("GRIDAI_GEN_ZONES", "3")),
+        meters_per_zone=int(os.getenv("GRIDAI_GEN_METERS", "1")),
+        rate=float(os.getenv("GRIDAI_GEN_RATE", "1000")),
+        seed=int(os.getenv("GRIDAI_GEN_SEED")) if os.getenv("GRIDAI_GEN_SEED") else None,
+    )
+    print(f"⚡ Synthetic generator started: {len(generator.zones)} zones × "
+          f"{generator.meters_per_zone} meters at {generator.rate:g} records/s.")
+
+    tamper = float(os.getenv("GRIDAI_GEN_TAMPER", "0"))
+    if tamper > 0:
+        delay = float(os.getenv("GRIDAI_GEN_TAMPER_AFTER", "60"))
+        threading.Timer(delay, generator.tamper, args=(tamper,)).start()
+
+    def emit(records):
+        data_queue.put(records)
+        _push_latest(latest_update_queue, records[-1], "latest")
+
+    generator.run(emit, batch_interval=float(os.getenv("GRIDAI_GEN_BATCH_INTERVAL", "0.1")))
+
+
 # ===============================
 # PATHWAY PIPELINE WORKER
 # ===============================
 
+def derived_columns(pw):
+    """
+    Enriched per-row fields as native Pathway expressions over the input
+    table (which carries the zone's capacity), for table.select(**...).
+    """
+    ratio = pw.this.grid_load / pw.this.capacity
+    grid_load = pw.this.grid_load
+    return {
+        # Risk score: ratio of load to the zone's feeder capacity, capped at 1
+        "risk_score_pw": pw.if_else(ratio > 1.0, 1.0, ratio).num.round(3),
+        # Renewable percentage from solar vs total load
+        "renewable_percent": pw.if_else(
+            grid_load > 0,
+            (pw.this.solar_generation / pw.if_else(grid_load > 0, grid_load, 1) * 100).num.round(2),
+            0.0,
+        ),
+    }
+
+
 def pathway_worker():
     """
     Full Pathway pipeline — same as the WSL setup.
     Reads from data_queue via a ConnectorSubject, processes the stream,
-    and updates latest_data via pw.io.subscribe.
+    and publishes latest_snapshot via pw.io.subscribe.
     Railway runs on Linux, same as WSL, so Pathway runs natively here.
     """
-    global latest_data
-
     print("⚙️ Starting Pathway pipeline worker...")
 
     import pathway as pw
@@ -123,99 +308,207 @@ def pathway_worker():
 
     class EnergySchema(pw.Schema):
         timestamp: str
+        ts: float
         zone: str
+        meter_id: str = pw.column_definition(default_value="")
+        # Stage timestamp stamped by QueueConnector when the record leaves data_queue
+        t_dequeue: float = pw.column_definition(default_value=0.0)
+        # Feeder capacity of the zone, looked up once at ingest
+        capacity: float = pw.column_definition(default_value=200.0)
         household_load: int
         solar_generation: int
         grid_load: int
         temperature: int
 
     class QueueConnector(ConnectorSubject):
+        def __init__(self, partition):
+            super().__init__()
+            self.partition = partition
+
         def run(self):
-            print("🔌 Pathway QueueConnector started — feeding data_queue into pipeline.")
+            print(f"🔌 Pathway QueueConnector {self.partition} started — feeding data_queue into pipeline.")
+            pipeline_ready.set()
+            capacity = capacities.capacity
+            source = data_queue.partitions[self.partition]
             while True:
-                record = data_queue.get()   # blocks until data arrives
-                self.next(**record)
-
-    # Build the Pathway table from the queue connector
-    table = pw.io.python.read(
-        QueueConnector(),
-        schema=EnergySchema,
-    )
+                # Up to CONNECTOR_BATCH records (what arrives within CONNECTOR_LINGER)
+                # go in as one commit; next() blocks while the engine backlog is full
+                batch = source.drain(CONNECTOR_BATCH, linger=CONNECTOR_LINGER)
+                dequeued = _clock()
+                for record in batch:
+                    self.next(**record, t_dequeue=dequeued, capacity=capacity(record["zone"]))
+                self.commit()
+
+    # Build the Pathway table from one queue connector per data_queue partition.
+    # Batches are committed explicitly; the autocommit timer is only a backstop
+    inputs = [
+        pw.io.python.read(
+            QueueConnector(partition),
+            schema=EnergySchema,
+            autocommit_duration_ms=1000,
+            max_backlog_size=CONNECTOR_BACKLOG,
+        )
+        for partition in range(len(data_queue.partitions))
+    ]
+    table = inputs[0] if len(inputs) == 1 else pw.Table.concat_reindex(*inputs)
 
     # ── Pathway transformations ───────────────────────────────────────
-    # Compute a running windowed average of grid_load
-    windowed = table.windowby(
-        pw.this.timestamp,
-        window=pw.temporal.sliding(duration=10, hop=1),
-        instance=pw.this.zone,
-    ).reduce(
-        zone=pw.reducers.any(pw.this.zone),
-        grid_load_avg=pw.reducers.avg(pw.this.grid_load),
-    )
+    # Multi-resolution per-zone window stats over event time (epoch ts), one
+    # reduction per entry of aggregates.WINDOWS. Each window's count/sum/min/
+    # max/histogram is incremental reducer state (see aggregates.combine_values);
+    # windows are dropped from engine state once past their cutoff.
+    window_stats = pw.reducers.stateful_many(aggregates.combine_values)
+    windowed = {}
+    for name, duration, hop, _ in aggregates.WINDOWS:
+        window = (pw.temporal.tumbling(duration=duration) if hop is None
+                  else pw.temporal.sliding(duration=duration, hop=hop))
+        windowed[name] = table.windowby(
+            pw.this.ts,
+            window=window,
+            instance=pw.this.zone,
+            behavior=pw.temporal.common_behavior(cutoff=duration, keep_results=False),
+        ).reduce(
+            zone=pw.this._pw_instance,
+            start=pw.this._pw_window_start,
+            end=pw.this._pw_window_end,
+            load=window_stats(pw.this.grid_load),
+            solar=window_stats(pw.this.solar_generation),
+        )
 
     # Main processed output — enriched fields Pathway calculates per row
     processed = table.select(
+        timestamp=pw.this.timestamp,
+        ts=pw.this.ts,
+        t_dequeue=pw.this.t_dequeue,
         zone=pw.this.zone,
         grid_load=pw.this.grid_load,
         solar_generation=pw.this.solar_generation,
-        # Predicted next load: current + small simulated delta
-        predicted_load=pw.this.grid_load + pw.apply(lambda _: random.randint(-10, 20), pw.this.grid_load),
-        # Risk score: ratio of load to 200 MW capacity
-        risk_score_pw=pw.apply(lambda v: round(min(v / 200.0, 1.0), 3), pw.this.grid_load),
-        # Renewable percentage from solar vs total load
-        renewable_percent=pw.apply(
-            lambda s, g: round((s / g) * 100, 2) if g > 0 else 0,
-            pw.this.solar_generation,
-            pw.this.grid_load,
-        ),
+        household_load=pw.this.household_load,
+        temperature=pw.this.temperature,
+        # Derived columns are native Pathway expressions, evaluated in the engine
+        # without a Python callback per row (see derived_columns)
+        **derived_columns(pw),
     )
 
-    def on_update(key, row, time, is_addition):
-        """Called by Pathway for every processed row — updates global latest_data."""
-        global latest_data
-
-        with data_lock:
-            next_latest = dict(latest_data)
+    # Per-meter theft detection: each meter's EWMA baseline is incremental
+    # reducer state, advanced O(1) per reading (see theft.update_meter)
+    meter_state = table.filter(pw.this.meter_id != "").groupby(pw.this.meter_id).reduce(
+        meter_id=pw.this.meter_id,
+        zone=pw.reducers.any(pw.this.zone),
+        state=pw.reducers.stateful_many(theft.combine_readings)(pw.this.ts, pw.this.grid_load),
+    )
 
-            next_latest["grid_load"]       = row["grid_load"]
-            next_latest["solar_generation"]= row["solar_generation"]
-            next_latest["predicted_load"]  = row["predicted_load"]
-            next_latest["risk_score_pw"]   = row["risk_score_pw"]
-            next_latest["renewable_percent"]= row["renewable_percent"]
-            next_latest["pathway_status"]  = "Running"
+    def on_meter_update(key, row, time, is_addition):
+        theft.monitor.observe(row["meter_id"], row["zone"], row["state"], is_addition)
 
-            latest_data = next_latest
+    def on_window_update(name, key, row, time, is_addition):
+        # Retractions are superseded windows or windows past their cutoff: the stores keep them
+        if is_addition:
+            window_aggregates.observe(name, row["zone"], row["start"], row["end"], row["load"], row["solar"])
 
-    pw.io.subscribe(processed, on_update)
+    # Rows of the current Pathway time step, applied together when it closes
+    pending = []
 
-    print("🚀 STARTING PATHWAY ENGINE (pw.run)")
+    def on_update(key, row, time, is_addition):
+        if is_addition:
+            pending.append(row)
+
+    def on_time_end(time):
+        if pending:
+            rows = pending[:]
+            del pending[:]
+            apply_batch(rows)
+
+    pw.io.subscribe(processed, on_update, on_time_end=on_time_end)
+    pw.io.subscribe(meter_state, on_meter_update)
+    for name, stats in windowed.items():
+        pw.io.subscribe(stats, functools.partial(on_window_update, name))
+
+    # Subscriber callbacks still run on a single thread, so apply_batch and the
+    # stores it feeds need no extra locking with several workers
+    os.environ.setdefault("PATHWAY_THREADS", str(PATHWAY_WORKERS))
+    print(f"🚀 STARTING PATHWAY ENGINE (pw.run, {os.environ['PATHWAY_THREADS']} worker(s), "
+          f"{len(inputs)} input partition(s))")
     pw.run()   # blocking — runs the full Pathway event loop
 
 
+def apply_batch(rows):
+    """
+    Applies the rows of one Pathway commit: folds each into the forecaster,
+    zone store and segment store, then publishes a single snapshot for the
+    whole batch, so publishing (and everything derived from a snapshot)
+    costs per commit, not per row. A commit's rows come in key order, so
+    they are put in ts order first (stable): the stores and the forecaster
+    expect each zone's readings oldest first.
+    """
+    global processed_count
+
+    rows.sort(key=_row_ts)
+    t_out = _clock()
+    per_zone = {}
+    observe, value = forecaster.observe, window_aggregates.value
+    for row in rows:
+        zone = row["zone"]
+        # Per-zone forecaster: O(1) per reading, all zones re-fit once per interval
+        row["predicted_load"] = observe(zone, row["ts"], row["grid_load"], row["temperature"])
+        row["grid_load_avg"] = value(zone, "rolling_5m", "grid_load_avg")
+        for callback in _row_listeners:
+            callback(row)
+        zone_store.record(zone, row["ts"], row)
+        if segment_store is not None:
+            segment_store.append(zone, row["ts"], row)
+        per_zone[zone] = per_zone.get(zone, 0) + 1
+
+    processed_count += len(rows)
+    for zone, count in per_zone.items():
+        metrics.records_total.inc(zone, amount=count)
+
+    row = rows[-1]   # the newest reading
+    publish_snapshot({
+        "timestamp":        row["timestamp"],
+        "zone":             row["zone"],
+        "household_load":   row["household_load"],
+        "temperature":      row["temperature"],
+        "grid_load":        row["grid_load"],
+        "solar_generation": row["solar_generation"],
+        "predicted_load":   row["predicted_load"],
+        "grid_load_avg":    row["grid_load_avg"],
+        "aggregates":       window_aggregates.latest(row["zone"]),
+        "risk_score_pw":    row["risk_score_pw"],
+        "renewable_percent": row["renewable_percent"],
+        "pathway_status":   "Running",
+    }, row["ts"])
+
+    t_published = _clock()
+    metrics.stage_latency.observe_many([r["t_dequeue"] - r["ts"] for r in rows], "queue")
+    metrics.stage_latency.observe_many([t_out - r["t_dequeue"] for r in rows], "pathway")
+    metrics.stage_latency.observe_many([t_published - t_out] * len(rows), "publish")
+    metrics.stage_latency.observe_many([t_published - r["ts"] for r in rows], "end_to_end")
+
+
 # ===============================
 # LATEST DATA UPDATER
 # ===============================
 
 def run_latest_data_updater_loop():
     """
-    Keeps latest_data populated with raw fields (zone, timestamp, temperature, etc.)
-    from the generator. Pathway handles the enriched fields (predicted_load, risk, etc.).
+    Keeps the snapshot populated with raw fields (zone, timestamp, temperature, etc.)
+    from the generator until the Pathway pipeline publishes its first batch; from
+    then on apply_batch carries the raw fields too, so there is one writer.
     """
-    global latest_data
-
     print("🧠 Latest-data snapshot updater started.")
 
     while True:
         record = latest_update_queue.get()
-
-        with data_lock:
-            next_latest = dict(latest_data)
-            # Only update raw generator fields — do NOT touch Pathway-computed fields
-            next_latest["timestamp"]      = record["timestamp"]
-            next_latest["zone"]           = record["zone"]
-            next_latest["household_load"] = record["household_load"]
-            next_latest["solar_generation"] = record["solar_generation"]
-            next_latest["grid_load"]      = record["grid_load"]
-            next_latest["temperature"]    = record["temperature"]
-
-            latest_data = next_latest
\ No newline at end of file
+        if latest_snapshot.data.get("pathway_status") == "Running":
+            continue
+
+        # Only update raw generator fields — do NOT touch Pathway-computed fields
+        publish_snapshot({
+            "timestamp":        record["timestamp"],
+            "zone":             record["zone"],
+            "household_load":   record["household_load"],
+            "solar_generation": record["solar_generation"],
+            "grid_load":        record["grid_load"],
+            "temperature":      record["temperature"],
+        }, record.get("ts"))
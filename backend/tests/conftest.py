@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the backend modules directly and must never write segment files
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["GRIDAI_SEGMENT_DIR"] = ""
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+import main
+from aggregates import combine_values, summarize, window_aggregates
+
+
+def _state(values):
+    state = None
+    for value, count in values:
+        state = combine_values(state, [((value,), count)])
+    return state
+
+
+def test_rows_are_weighted_by_multiplicity():
+    state = _state([(10.0, 1), (20.0, 3)])
+    stats = summarize(state, "grid_load")
+    assert state[0] == 4
+    assert stats["grid_load_avg"] == 17.5
+    assert (stats["grid_load_min"], stats["grid_load_max"]) == (10.0, 20.0)
+
+
+def test_history_defaults_to_window_average_and_rejects_bad_parameters():
+    zone = "Test History Zone"
+    base = 1_800_000_000.0
+    for k in range(3):
+        start = base + 300 * k
+        window_aggregates.observe("5m", zone, start, start + 300, _state([(100.0 + k, 2)]), _state([(30.0, 2)]))
+    client = TestClient(main.app)
+    window = {"zone": zone, "resolution": "5m", "from": base, "to": base + 900}
+
+    response = client.get("/history", params=window)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metric"] == "grid_load_avg"
+    assert body["ts"] == [base, base + 300, base + 600]
+    assert client.get("/history", params={**window, "metric": "grid_load"}).json()["metric"] == "grid_load_avg"
+
+    assert client.get("/history", params={**window, "metric": "voltage"}).status_code == 400
+    assert client.get("/history", params={**window, "resolution": "2m"}).status_code == 400
+    assert client.get("/history", params={**window, "zone": "Nowhere"}).status_code == 404
@@ -0,0 +1,36 @@
+import random
+from datetime import datetime
+
+import numpy as np
+
+import stream
+from history import query_history
+
+
+def _row(zone, ts):
+    return {
+        "timestamp": datetime.fromtimestamp(ts).isoformat(), "ts": ts, "t_dequeue": ts, "zone": zone,
+        "household_load": 80, "solar_generation": 30, "grid_load": 100 + int(ts) % 50, "temperature": 30,
+        "risk_score_pw": 0.5, "renewable_percent": 30.0,
+    }
+
+
+def test_unsorted_batch_is_recorded_in_ts_order():
+    zone = "Test Order Zone"
+    base = 1_800_000_000.0
+    stamps = [base + i for i in range(200)]
+    random.Random(1).shuffle(stamps)
+
+    stream.apply_batch([_row(zone, ts) for ts in stamps])
+
+    result = query_history(zone, start=base - 1, end=base + 1000, points=1000, mode="lttb")
+    assert result["raw_points"] == 200
+    assert np.all(np.diff(result["ts"]) > 0)
+
+    # from/to filters rely on the ring being sorted
+    window = query_history(zone, start=base + 50, end=base + 59, points=1000)
+    assert window["ts"] == [base + i for i in range(50, 60)]
+
+    # The snapshot comes from the newest reading, not the last row delivered
+    assert stream.latest_snapshot.source_ts == base + 199
+    assert stream.zone_store.zone(zone).oldest() == base
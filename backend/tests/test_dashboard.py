@@ -0,0 +1,63 @@
+import json
+
+import dashboard
+import geo
+import stream
+
+
+def _publish(zone, load, ts):
+    stream.zone_store.record(zone, ts, {"grid_load": load, "solar_generation": 30})
+    fields = {
+        "zone": zone, "grid_load": load, "solar_generation": 30, "household_load": 80, "temperature": 30,
+        "pathway_status": "Running",
+    }
+    return stream.publish_snapshot(fields, ts)
+
+
+def test_incremental_build_matches_payload_and_deltas_carry_changes_only():
+    names = geo.registry.names
+    base = 1_900_000_000.0
+    for i, zone in enumerate(names):
+        _publish(zone, 100 + 40 * i, base)
+    first = dashboard.view.update(_publish(names[0], 100, base + 1))
+
+    # The spliced body is the payload, and the feeders are most utilised first
+    body = json.loads(first.body)
+    assert body == json.loads(dashboard.encode_json(first.payload))
+    utilisation = [f["utilisation"] for f in body["risk"]["feeders"]]
+    assert utilisation == sorted(utilisation, reverse=True)
+
+    second = dashboard.view.update(_publish(names[1], 400, base + 2))
+    assert dashboard.live_frame(None, second) == second.body
+
+    delta = json.loads(dashboard.live_frame(first, second))
+    assert delta["delta"] is True and delta["since"] == first.version and delta["version"] == second.version
+    assert [f["feeder"] for f in delta["risk"]["feeders"]] == [names[1]]
+    assert [f["zone"] for f in delta["map"]] == [geo.registry.labels[1]]
+    assert delta["live"] == second.payload["live"]
+
+    # Applying the delta to the first map yields the second
+    merged = {f["zone"]: f for f in body["map"]}
+    merged.update((f["zone"], f) for f in delta["map"])
+    assert list(merged.values()) == json.loads(second.body)["map"]
+
+
+def test_live_clients_get_prebuilt_deltas_or_the_whole_body():
+    names = geo.registry.names
+    base = 1_950_000_000.0
+    view = dashboard.DerivedView(delta_history=2)
+    frames = [view.build_live(_publish(names[k % len(names)], 100 + 10 * k, base + k)) for k in range(4)]
+    assert view.build_live(stream.latest_snapshot) is None       # nothing new to publish
+
+    latest = frames[-1]
+    assert [(since, version) for since, version, _ in latest.deltas] == [
+        (frames[1].version, frames[2].version), (frames[2].version, frames[3].version),
+    ]
+    assert dashboard.catch_up(latest, None) == [latest.body]
+    assert dashboard.catch_up(latest, latest.version) == []
+    # One version behind: one delta; two behind: both, in order
+    assert dashboard.catch_up(latest, frames[2].version) == [latest.deltas[1][2]]
+    assert dashboard.catch_up(latest, frames[1].version) == [d for _, _, d in latest.deltas]
+    # Further behind than the kept deltas: the whole body
+    assert dashboard.catch_up(latest, frames[0].version) == [latest.body]
+    assert json.loads(latest.deltas[1][2])["since"] == frames[2].version
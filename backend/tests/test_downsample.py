@@ -0,0 +1,23 @@
+import numpy as np
+
+from downsample import minmax
+
+
+def test_minmax_keeps_a_flat_bucket_once():
+    ts = np.arange(100, dtype=np.float64)
+    values = np.ones(100)
+    values[10] = 5.0                       # one spike in the first bucket
+
+    out_ts, out_values = minmax(ts, values, 10)
+    assert np.all(np.diff(out_ts) > 0)
+    assert 5.0 in out_values
+    assert len(out_ts) == 6                # spike bucket: 2 points, four flat buckets: 1 each
+
+
+def test_minmax_keeps_min_and_max_of_every_bucket():
+    rng = np.random.default_rng(0)
+    ts = np.arange(1000, dtype=np.float64)
+    values = rng.normal(size=1000)
+    out_ts, out_values = minmax(ts, values, 20)
+    assert len(out_ts) == 20 and np.all(np.diff(out_ts) > 0)
+    assert out_values.max() == values.max() and out_values.min() == values.min()
@@ -0,0 +1,13 @@
+import pytest
+
+from geo import parse_bbox
+
+
+@pytest.mark.parametrize("value", ["nan,28,77.2,28.8", "0,0,inf,1", "-inf,0,1,1", "1,2,3", "a,b,c,d", "2,0,1,1"])
+def test_malformed_bbox_is_rejected(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_bbox_is_parsed():
+    assert parse_bbox("77.0,28.5,77.2,28.8") == (77.0, 28.5, 77.2, 28.8)
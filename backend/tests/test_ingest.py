@@ -0,0 +1,51 @@
+import json
+import time
+from datetime import datetime
+
+import ingest
+
+
+class _Queue:
+    def __init__(self):
+        self.records = []
+
+    def put(self, records):
+        self.records.extend(records)
+        return len(records)
+
+
+def _body(*stamps):
+    readings = [
+        {"zone": "Zone A", "household_load": 80, "solar_generation": 30, "grid_load": 120, "temperature": 30, "ts": ts}
+        for ts in stamps
+    ]
+    return "\n".join(json.dumps(r) for r in readings).encode()
+
+
+def test_default_bounds_reject_future_readings_tightly_and_past_ones_loosely():
+    now = 1_800_000_000.0
+    hour = 3600
+    body = _body(now - 20 * hour, now - 30, now + 30, now + 20 * hour, now - 48 * hour, now * 1000)
+
+    records, rejected, reasons = ingest.parse_readings(body, now=now)
+    assert [r["ts"] for r in records] == [now - 20 * hour, now - 30, now + 30]
+    assert rejected == 3 and reasons == {"ts": 3}
+
+    _, rejected, _ = ingest.parse_readings(body, now=now, max_skew=0, max_ahead=0)
+    assert rejected == 0
+
+
+def test_derived_timestamp_is_local_time():
+    now = int(time.time()) + 0.25
+    records, _, _ = ingest.parse_readings(_body(now - 5, None), now=now)
+    for record in records:
+        assert datetime.fromisoformat(record["timestamp"]) == datetime.fromtimestamp(record["ts"])
+
+
+def test_ingest_reports_skewed_readings_as_rejected(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_SKEW", 60.0)
+    queue = _Queue()
+    ack = ingest.ingest(queue, _body(1_000_000.0, None))
+    assert ack["accepted"] == 1 and ack["rejected"] == 1
+    assert ack["rejected_by_field"] == {"ts": 1}
+    assert len(queue.records) == 1
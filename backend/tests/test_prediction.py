@@ -0,0 +1,13 @@
+from prediction import LoadForecaster
+
+
+def test_new_zone_forecasts_about_its_last_load_from_the_first_fit():
+    forecaster = LoadForecaster(interval=5.0)
+    start = 1_700_000_000.0
+    for k in range(4):
+        forecaster.observe("Zone Cold", start + 5 * k, 400.0 + k, 30.0)
+    forecaster.step(start + 20)
+
+    # Three fitted intervals: zero-initialised weights forecast well under half the load
+    predicted = forecaster.forecast(["Zone Cold"])["Zone Cold"]["predicted_load"]
+    assert abs(predicted - 403.0) / 403.0 < 0.02
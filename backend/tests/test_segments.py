@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from segments import SegmentStore
+
+
+def test_late_reading_is_stored_in_its_own_slot(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=60)
+    base = (int(time.time()) // 60 - 5) * 60.0
+    store.append("Zone A", base + 10, {"grid_load": 1.0})
+    store.append("Zone A", base + 130, {"grid_load": 3.0})   # rolls two slots ahead
+    store.flush()
+    store.read("Zone A", "grid_load", base, base + 59)         # maps the closed segment
+    store.append("Zone A", base + 70, {"grid_load": 2.0})    # late: slot before the open one
+    store.append("Zone A", base + 5, {"grid_load": 0.5})     # late, into the mapped segment
+    store.flush()
+
+    assert sorted(store.segment_starts()) == [base, base + 60, base + 120]
+    ts, values = store.read("Zone A", "grid_load", base + 60, base + 119)
+    assert ts.tolist() == [base + 70] and values.tolist() == [2.0]
+    ts, values = store.read("Zone A", "grid_load", base, base + 200)
+    assert ts.tolist() == [base + 5, base + 10, base + 70, base + 130]
+    assert np.all(np.diff(ts) > 0)
+
+
+def test_reading_past_retention_is_dropped(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_seconds=60, retention_seconds=600)
+    now = time.time()
+    store.append("Zone A", now, {"grid_load": 1.0})
+    store.append("Zone A", now - 3600, {"grid_load": 2.0})
+    store.flush()
+    ts, _ = store.read("Zone A", "grid_load", now - 7200, now + 1)
+    assert ts.tolist() == [now]
@@ -0,0 +1,82 @@
+import queue
+
+import pytest
+
+import sources
+
+
+class _Broker:
+    def __init__(self, host, port=1883):
+        self.host, self.port = host, port
+
+
+@pytest.mark.parametrize("spec, host, port, topic", [
+    ("mqtt://broker:1883/meters/#", "broker", 1883, "meters/#"),
+    ("mqtt://broker/meters/+/readings", "broker", 1883, "meters/+/readings"),
+    ("mqtt://10.0.0.5:8883/+/zone/#", "10.0.0.5", 8883, "+/zone/#"),
+    ("mqtt://broker:1883/#", "broker", 1883, "#"),
+])
+def test_mqtt_spec_keeps_wildcards(monkeypatch, spec, host, port, topic):
+    monkeypatch.setattr(sources, "MqttBroker", _Broker)
+    source = sources.source_from_spec(spec, queue.Queue())
+    assert (source.broker.host, source.broker.port, source.topic_filter) == (host, port, topic)
+
+
+def test_mqtt_spec_without_topic_is_rejected(monkeypatch):
+    monkeypatch.setattr(sources, "MqttBroker", _Broker)
+    with pytest.raises(ValueError):
+        sources.source_from_spec("mqtt://broker:1883/", queue.Queue())
+
+
+@pytest.mark.parametrize("spec, topic", [
+    ("local://meters/#", "meters/#"),
+    ("local://meters/+/readings", "meters/+/readings"),
+    ("local://#", "#"),
+    ("local://", "#"),
+])
+def test_local_spec_keeps_wildcards(spec, topic):
+    assert sources.source_from_spec(spec, queue.Queue()).topic_filter == topic
+
+
+def test_local_wildcard_source_receives_matching_topics():
+    source = sources.source_from_spec("local://test-wildcards/+/readings", queue.Queue())
+    broker = sources.LocalBroker()
+    broker.subscribe(source.topic_filter, source.on_message)
+    broker.publish("test-wildcards/z1/readings", b"{}")
+    broker.publish("test-wildcards/z1/status", b"{}")
+    assert len(source._buffer) == 1
+
+
+class _Queue:
+    def __init__(self):
+        self.records = []
+
+    def put(self, records):
+        self.records.extend(records)
+        return len(records)
+
+
+def test_directory_source_skips_a_line_longer_than_a_chunk(monkeypatch, tmp_path):
+    monkeypatch.setattr(sources, "CHUNK_BYTES", 256)
+    line = b'{"zone": "%s", "household_load": 80, "solar_generation": 30, "grid_load": 120, "temperature": 30}\n'
+    path = tmp_path / "readings.ndjson"
+    path.write_bytes(line % b"Zone A" + line % (b"Z" * 1000) + line % b"Zone B")
+
+    queue = _Queue()
+    source = sources.DirectorySource(queue, str(tmp_path))
+    assert source.poll() == path.stat().st_size
+    assert [r["zone"] for r in queue.records] == ["Zone A", "Zone B"]
+
+    # A line still being written past a chunk is skipped once it completes
+    with open(path, "ab") as f:
+        f.write(b'{"zone": "' + b"Y" * 600)
+    source.poll()
+    with open(path, "ab") as f:
+        f.write(b'"}\n' + line % b"Zone C")
+    source.poll()
+    assert [r["zone"] for r in queue.records] == ["Zone A", "Zone B", "Zone C"]
+
+
+def test_source_needs_a_run_method():
+    with pytest.raises(TypeError):
+        sources.Source(queue.Queue())
@@ -0,0 +1,19 @@
+from theft import WARMUP, combine_readings, meter_level, update_meter
+
+
+def test_duplicated_row_counts_once_per_reading():
+    rows = [((float(t), 100.0), 1) for t in range(10)]
+    duplicated = rows + [((10.0, 100.0), 3)]
+
+    state = combine_readings(None, duplicated)
+    expected = None
+    for t in list(range(10)) + [10, 10, 10]:
+        expected = update_meter(expected, float(t), 100.0)
+    assert state == expected
+    assert state[0] == 13
+
+
+def test_duplicated_drop_extends_the_streak():
+    state = combine_readings(None, [((float(t), 100.0 + t % 3), 1) for t in range(WARMUP)])
+    state = combine_readings(state, [((100.0, 20.0), 3), ((99.0, 20.0), -1)])
+    assert state[3] == 3 and meter_level(state) == 2
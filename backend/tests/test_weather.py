@@ -0,0 +1,53 @@
+import asyncio
+
+from weather import WeatherService
+
+
+class _Response:
+    def json(self):
+        return {"main": {"temp": 30.0, "humidity": 40}, "weather": [{"description": "haze"}]}
+
+
+class _Client:
+    def __init__(self):
+        self.cities = []
+
+    async def get(self, url, params):
+        self.cities.append(params["q"])
+        return _Response()
+
+    async def aclose(self):
+        pass
+
+
+def test_cache_keeps_the_most_recently_requested_cities():
+    async def run():
+        client = _Client()
+        svc = WeatherService(base_url="http://stub", ttl=60, idle=100, max_cities=2, client=client)
+        for city in ("Delhi", "Mumbai", "Delhi", "Pune"):
+            await svc.get(city)
+        return svc, client
+
+    svc, client = asyncio.run(run())
+    assert set(svc._cache) == {"Delhi", "Pune"}
+    assert client.cities == ["Delhi", "Mumbai", "Pune"]
+
+
+def test_sweep_drops_idle_cities_and_refreshes_only_recent_ones():
+    async def run():
+        client = _Client()
+        svc = WeatherService(base_url="http://stub", ttl=60, idle=100, client=client)
+        await svc.get("Delhi")
+        await svc.get("Mumbai")
+        now = svc._accessed["Mumbai"]
+        svc._accessed["Delhi"] = now - 150    # not requested for longer than idle
+
+        svc._sweep(now + 55, 12)              # Mumbai is about to expire
+        await asyncio.sleep(0)
+        await asyncio.gather(*svc._inflight.values())
+        return svc, client
+
+    svc, client = asyncio.run(run())
+    assert list(svc._accessed) == ["Mumbai"]
+    assert "Delhi" not in svc._cache
+    assert client.cities == ["Delhi", "Mumbai", "Mumbai"]
@@ -1,3 +1,9 @@
+import os
+import threading
+
+import numpy as np
+
+
 def detect_theft(current_load, previous_load):
     """
     Detect abnormal drop in usage
@@ -21,7 +27,174 @@ def detect_theft(current_load, previous_load):
     }
 
 
+THEFT_LEVELS = np.array(["LOW", "MEDIUM", "HIGH"])
+LEVEL_CODES = {name: i for i, name in enumerate(THEFT_LEVELS.tolist())}
+
+
+# ===============================
+# STREAMING PER-METER DETECTOR
+# ===============================
+
+ALPHA = 0.05           # EWMA weight of each new reading
+WARMUP = 20            # readings before a meter can be flagged
+DROP_RATIO = 0.35      # a reading this far below baseline is a drop
+SUSTAIN = 3            # consecutive drops that make a sustained drop (HIGH)
+BREAK_Z = 4.0          # |z-score| above which a reading breaks the meter's pattern
+BREAK_ALPHA = 0.1      # EWMA weight of the pattern-break rate
+BREAK_RATE = 0.3       # break rate above which the pattern counts as broken (MEDIUM)
+REBASE_AFTER = 1000    # drops after which the lower level is accepted as the new normal
+
+
+def update_meter(state, ts, load):
+    """
+    One O(1) detector step for a meter.
+
+    state is (readings, mean, var, drop_streak, break_rate, ts, load), or
+    None for a new meter. mean/var are an exponentially weighted baseline;
+    the baseline is frozen while the meter is in a drop, so a tampered meter
+    does not teach the detector that low consumption is normal.
+    """
+    if state is None:
+        return (1, float(load), 0.0, 0, 0.0, ts, load)
+    n, mean, var, streak, rate, _, _ = state
+
+    std = var ** 0.5
+    z = (load - mean) / std if std > 1e-9 else 0.0
+    warm = n >= WARMUP
+    rate += BREAK_ALPHA * ((warm and abs(z) > BREAK_Z) - rate)
+
+    if warm and load < mean * (1 - DROP_RATIO):
+        streak += 1
+        if streak < REBASE_AFTER:
+            return (n + 1, mean, var, streak, rate, ts, load)
+        mean, streak = float(load), 0
+    else:
+        streak = 0
+
+    diff = load - mean
+    incr = ALPHA * diff
+    return (n + 1, mean + incr, (1 - ALPHA) * (var + diff * incr), streak, rate, ts, load)
+
+
+def combine_readings(state, rows):
+    """
+    Folds one batch of (ts, load) rows into a meter's state, in time order.
+    Shaped for pw.reducers.stateful_many; retractions are ignored. Identical
+    readings arrive as one row with a multiplicity, and each is a step.
+    """
+    for (ts, load), count in sorted(rows, key=lambda r: r[0][0]):
+        for _ in range(count):
+            state = update_meter(state, ts, load)
+    return state
+
+
+def meter_level(state):
+    """Theft level code for a detector state: HIGH on a sustained drop, MEDIUM on any drop or a broken pattern."""
+    streak, rate = state[3], state[4]
+    if streak >= SUSTAIN:
+        return 2
+    if streak > 0 or rate > BREAK_RATE:
+        return 1
+    return 0
+
+
+class TheftMonitor:
+    """
+    Current theft suspects, fed with every meter's detector state.
+
+    Only flagged meters are held (at most max_suspects), so memory does not
+    grow with the fleet; the per-meter baselines live in the Pathway
+    reducer state.
+    """
+
+    def __init__(self, max_suspects=10000):
+        self.max_suspects = max_suspects
+        self.meters = 0
+        self.overflow = 0
+        self._suspects = {}     # meter -> suspect dict
+        self._by_zone = {}      # zone -> {meter: level code}
+        self._lock = threading.Lock()
+
+    def observe(self, meter, zone, state, is_addition=True):
+        # Each state update arrives as a retraction of the old state plus the
+        # new one, so the net count of additions is the number of meters
+        if not is_addition:
+            self.meters -= 1
+            return
+        self.meters += 1
+        level = meter_level(state)
+        with self._lock:
+            if not level:
+                if meter in self._suspects:
+                    del self._suspects[meter]
+                    zone_meters = self._by_zone[zone]
+                    zone_meters.pop(meter, None)
+                    if not zone_meters:
+                        del self._by_zone[zone]
+                return
+            suspect = self._suspects.get(meter)
+            if suspect is None:
+                if len(self._suspects) >= self.max_suspects:
+                    self.overflow += 1
+                    return
+                suspect = self._suspects[meter] = {"meter_id": meter, "zone": zone, "since": state[5]}
+            n, mean, _, streak, rate, ts, load = state
+            suspect.update({
+                "theft_risk": str(THEFT_LEVELS[level]),
+                "load": load,
+                "baseline": round(mean, 2),
+                "drop": round(1 - load / mean, 3) if mean > 0 else 0.0,
+                "drop_streak": streak,
+                "pattern_break_rate": round(rate, 3),
+                "ts": ts,
+            })
+            self._by_zone.setdefault(zone, {})[meter] = level
+
+    def zone_level(self, zone):
+        """Highest theft level code among the zone's meters (0 if none flagged)."""
+        with self._lock:
+            levels = self._by_zone.get(zone)
+            return max(levels.values()) if levels else 0
+
+    def suspects(self, zone=None, level=None, limit=100):
+        """Flagged meters, strongest drop first."""
+        with self._lock:
+            rows = [dict(s) for s in self._suspects.values()
+                    if (zone is None or s["zone"] == zone) and (level is None or s["theft_risk"] == level)]
+        rows.sort(key=lambda s: (LEVEL_CODES[s["theft_risk"]], s["drop"]), reverse=True)
+        return rows[:limit]
+
+    def summary(self, top=10):
+        with self._lock:
+            counts = {name: 0 for name in THEFT_LEVELS.tolist()[1:]}
+            for s in self._suspects.values():
+                counts[s["theft_risk"]] += 1
+        worst = "HIGH" if counts["HIGH"] else "MEDIUM" if counts["MEDIUM"] else "LOW"
+        return {
+            "theft_risk": worst,
+            "meters_monitored": self.meters,
+            "suspects": sum(counts.values()),
+            "by_level": counts,
+            "top": self.suspects(limit=top),
+        }
+
+    def __len__(self):
+        return len(self._suspects)
+
+
+monitor = TheftMonitor(max_suspects=int(os.getenv("GRIDAI_THEFT_MAX_SUSPECTS", "10000")))
+
+
 # Test
 if __name__ == "__main__":
     result = detect_theft(40, 120)
     print(result)
+
+    # A steady meter, then 60% of its consumption disappears
+    state = None
+    for t in range(60):
+        if state is not None:
+            monitor.observe("M1", "Zone A", state, is_addition=False)
+        state = update_meter(state, t, 100 + (t % 5) if t < 50 else 40)
+        monitor.observe("M1", "Zone A", state)
+    print(monitor.summary())
@@ -1,30 +1,233 @@
-import requests
+import asyncio
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime
 
-API_KEY = "e8ae528d2c1c2f9d6fd57988b2e26099"
+import httpx
 
+import metrics
 
-def get_weather(city="Delhi"):
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
+API_KEY = os.getenv("OPENWEATHER_API_KEY", "e8ae528d2c1c2f9d6fd57988b2e26099")
+BASE_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
 
-    try:
-        response = requests.get(url)
-        data = response.json()
+weather_requests = metrics.registry.register(metrics.Counter(
+    "gridai_weather_requests_total", "/weather lookups by cache outcome.", labels=("result",),
+))
+weather_upstream = metrics.registry.register(metrics.Counter(
+    "gridai_weather_upstream_total", "Calls made to the weather API.", labels=("outcome",),
+))
+weather_evictions = metrics.registry.register(metrics.Counter(
+    "gridai_weather_evictions_total", "Cities dropped from the weather cache.", labels=("reason",),
+))
 
-        # If API returns error
-        if "main" not in data:
-            return {
-                "error": data.get("message", "Weather API error"),
-                "raw": data
-            }
 
+def parse_weather(city, data):
+    # If API returns error
+    if "main" not in data:
         return {
-            "city": city,
-            "temperature": data["main"]["temp"],
-            "humidity": data["main"]["humidity"],
-            "weather": data["weather"][0]["description"],
-            "timestamp": datetime.now().isoformat()   # 👈 shows update time
+            "error": data.get("message", "Weather API error"),
+            "raw": data
         }
 
-    except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+    return {
+        "city": city,
+        "temperature": data["main"]["temp"],
+        "humidity": data["main"]["humidity"],
+        "weather": data["weather"][0]["description"],
+        "timestamp": datetime.now().isoformat()   # 👈 shows update time
+    }
+
+
+class WeatherService:
+    """
+    Cached, non-blocking weather lookups.
+
+    - Per-city TTL cache: fresh entries are served without touching the API.
+    - Stale-while-revalidate: entries past ttl but within max_stale are served
+      immediately while one background fetch refreshes them.
+    - Concurrent lookups for the same city share a single in-flight fetch.
+    - One pooled httpx.AsyncClient with connect/read timeouts.
+    - A background refresher re-fetches every city requested within idle
+      seconds shortly before its entry expires, so hot cities never go stale.
+      Cities not requested for idle seconds are dropped, and at most
+      max_cities are kept (least recently requested evicted first), so
+      arbitrary ?city= values cannot grow the cache or the refresh traffic.
+    """
+
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, ttl=600.0, max_stale=3600.0,
+                 error_ttl=30.0, timeout=5.0, idle=1800.0, max_cities=256, client=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.idle = idle
+        self.max_cities = max_cities
+        self._client = client
+        self._accessed = OrderedDict()   # city -> last requested (monotonic), least recent first
+        self._cache = {}        # city -> (fetched_at monotonic, payload)
+        self._errors = {}       # city -> (failed_at monotonic, error payload)
+        self._inflight = {}     # city -> asyncio.Task
+        self._refresher = None
+
+    async def start(self, refresh=True):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 2.0)),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        if refresh and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, city="Delhi"):
+        now = time.monotonic()
+        self._touch(city, now)
+        cached = self._cache.get(city)
+        if cached is not None:
+            age = now - cached[0]
+            if age < self.ttl:
+                weather_requests.inc("hit")
+                return cached[1]
+            if age < self.max_stale:
+                weather_requests.inc("stale")
+                self._revalidate(city)
+                return cached[1]
+
+        # Recently failed and nothing usable cached: don't hammer the API
+        failed = self._errors.get(city)
+        if failed is not None and now - failed[0] < self.error_ttl:
+            weather_requests.inc("error")
+            return failed[1]
+
+        weather_requests.inc("miss")
+        return await asyncio.shield(self._revalidate(city))
+
+    def _touch(self, city, now):
+        accessed = self._accessed
+        accessed[city] = now
+        accessed.move_to_end(city)
+        while len(accessed) > self.max_cities:
+            self._evict(next(iter(accessed)), "capacity")
+
+    def _evict(self, city, reason):
+        self._accessed.pop(city, None)
+        self._cache.pop(city, None)
+        self._errors.pop(city, None)
+        weather_evictions.inc(reason)
+
+    def _revalidate(self, city):
+        """The in-flight fetch for city, starting one if none is running."""
+        task = self._inflight.get(city)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(city))
+            self._inflight[city] = task
+            task.add_done_callback(lambda _: self._inflight.pop(city, None))
+        return task
+
+    async def _fetch(self, city):
+        if self._client is None:
+            await self.start(refresh=False)
+        try:
+            response = await self._client.get(
+                self.base_url, params={"q": city, "appid": self.api_key, "units": "metric"},
+            )
+            result = parse_weather(city, response.json())
+        except Exception as e:
+            result = {"error": str(e)}
+
+        now = time.monotonic()
+        # Evicted while the fetch was running: return the result, don't cache it
+        tracked = city in self._accessed
+        if "error" in result:
+            weather_upstream.inc("error")
+            if tracked:
+                self._errors[city] = (now, result)
+            cached = self._cache.get(city)
+            # Keep serving the last good reading while it is within max_stale
+            if cached is not None and now - cached[0] < self.max_stale:
+                return cached[1]
+            return result
+
+        weather_upstream.inc("ok")
+        self._errors.pop(city, None)
+        if tracked:
+            self._cache[city] = (now, result)
+        return result
+
+    def _sweep(self, now, interval):
+        """Drops idle cities and expired errors; refreshes the rest before they expire."""
+        for city, accessed_at in list(self._accessed.items()):
+            if now - accessed_at <= self.idle:
+                break   # least recent first: every later city was requested more recently
+            self._evict(city, "idle")
+        for city, (failed_at, _) in list(self._errors.items()):
+            if now - failed_at >= self.error_ttl:
+                del self._errors[city]
+        for city, (fetched_at, _) in list(self._cache.items()):
+            if now - fetched_at > self.ttl - interval:
+                self._revalidate(city)
+
+    async def _refresh_loop(self):
+        interval = max(self.ttl * 0.2, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            self._sweep(time.monotonic(), interval)
+
+
+service = WeatherService(
+    ttl=float(os.getenv("GRIDAI_WEATHER_TTL", "600")),
+    max_stale=float(os.getenv("GRIDAI_WEATHER_MAX_STALE", "3600")),
+    timeout=float(os.getenv("GRIDAI_WEATHER_TIMEOUT", "5")),
+    idle=float(os.getenv("GRIDAI_WEATHER_IDLE", "1800")),
+    max_cities=int(os.getenv("GRIDAI_WEATHER_MAX_CITIES", "256")),
+)
+
+
+# Test against a local stub server: python weather.py
+if __name__ == "__main__":
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    calls = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            time.sleep(0.2)   # slow upstream
+            body = json.dumps({"main": {"temp": 31.5, "humidity": 40}, "weather": [{"description": "haze"}]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    async def demo():
+        svc = WeatherService(base_url=f"http://127.0.0.1:{stub.server_port}/weather", ttl=0.5, max_stale=5)
+        await svc.start(refresh=False)
+        results = await asyncio.gather(*(svc.get("Delhi") for _ in range(50)))
+        print("50 concurrent lookups →", len(calls), "upstream call(s):", results[0])
+        await asyncio.sleep(0.6)
+        started = time.perf_counter()
+        await svc.get("Delhi")
+        print(f"stale lookup served in {1000 * (time.perf_counter() - started):.2f} ms while revalidating")
+        await asyncio.sleep(0.3)
+        print("upstream calls so far:", len(calls))
+        await svc.close()
+
+    asyncio.run(demo())
@@ -0,0 +1,227 @@
+import threading
+
+import numpy as np
+
+
+# Metrics retained per zone, in column order of each zone's value buffer
+METRICS = (
+    "grid_load",
+    "solar_generation",
+    "household_load",
+    "temperature",
+    "predicted_load",
+    "risk_score_pw",
+    "renewable_percent",
+    "grid_load_avg",
+)
+METRIC_INDEX = {name: i for i, name in enumerate(METRICS)}
+
+
+class ZoneHistory:
+    """
+    Fixed-capacity ring buffer of one zone's readings.
+
+    Storage is preallocated up front (one float64 timestamp column plus one
+    float32 row per metric), so appends are O(1) and memory never grows.
+    """
+
+    __slots__ = ("capacity", "metrics", "metric_index", "ts", "values", "_next", "_size")
+
+    def __init__(self, capacity, metrics=METRICS):
+        self.capacity = capacity
+        self.metrics = metrics
+        self.metric_index = METRIC_INDEX if metrics is METRICS else {name: i for i, name in enumerate(metrics)}
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((len(metrics), capacity), np.nan, dtype=np.float32)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, ts, row):
+        """Appends one reading; row is a sequence of len(metrics) values."""
+        i = self._next
+        self.ts[i] = ts
+        self.values[:, i] = row
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def upsert(self, ts, row):
+        """
+        Like append, but a reading with the same ts as the newest one replaces
+        it (a window re-emitted with more data). Readings older than the
+        newest are ignored; returns whether the row was stored.
+        """
+        if self._size:
+            last = self._next - 1
+            if ts == self.ts[last]:
+                self.values[:, last] = row
+                return True
+            if ts < self.ts[last]:
+                return False
+        self.append(ts, row)
+        return True
+
+    def oldest(self):
+        """Timestamp of the oldest retained reading (None if empty)."""
+        if not self._size:
+            return None
+        i = self._next if self._size == self.capacity else 0
+        return float(self.ts[i])
+
+    def last(self):
+        """Most recent reading as a dict, or None if empty."""
+        if not self._size:
+            return None
+        i = self._next - 1
+        row = self.values[:, i]
+        reading = {
+            # float32 storage — round away representation noise
+            name: None if np.isnan(row[m]) else round(float(row[m]), 4)
+            for m, name in enumerate(self.metrics)
+        }
+        reading["ts"] = float(self.ts[i])
+        return reading
+
+    def segments(self):
+        """
+        Retained data in time order as (ts, values) view pairs — zero-copy.
+
+        One pair while the buffer has not wrapped, two afterwards (older part
+        first). Views alias live storage and are overwritten once the buffer
+        wraps past them; copy if they must outlive the next few ticks.
+        """
+        if self._size < self.capacity:
+            return [(self.ts[:self._size], self.values[:, :self._size])]
+        i = self._next
+        if i == 0:
+            return [(self.ts, self.values)]
+        return [(self.ts[i:], self.values[:, i:]), (self.ts[:i], self.values[:, :i])]
+
+    def series(self, metric, since=None):
+        """(ts, values) arrays for one metric, optionally only readings with ts >= since."""
+        m = self.metric_index[metric]
+        parts = self.segments()
+        if len(parts) == 1:
+            ts, values = parts[0][0], parts[0][1][m]
+        else:
+            ts = np.concatenate([p[0] for p in parts])
+            values = np.concatenate([p[1][m] for p in parts])
+        if since is not None:
+            start = np.searchsorted(ts, since, side="left")
+            ts, values = ts[start:], values[start:]
+        return ts, values
+
+
+class ZoneStore:
+    """
+    Per-zone state: the latest reading and a bounded history for every zone.
+
+    Memory is capacity * (8 + 4 * len(metrics)) bytes per zone and at most
+    max_zones zones are tracked; readings for further zones are dropped.
+    metrics defaults to METRICS (raw readings); other stores, such as the
+    windowed aggregates, keep their own columns.
+
+    The latest reading of every zone is also kept as one row of a dense
+    [zones x metrics] matrix, in order of first appearance, so per-tick
+    scoring of all zones is a single vectorised pass (see latest_matrix).
+    """
+
+    def __init__(self, capacity=3600, max_zones=10000, metrics=METRICS):
+        self.capacity = capacity
+        self.max_zones = max_zones
+        self.metrics = metrics
+        self.metric_index = METRIC_INDEX if metrics is METRICS else {name: i for i, name in enumerate(metrics)}
+        self._zones = {}
+        self._names = []     # row index -> zone name, append-only
+        self._rows = {}      # zone name -> row index
+        self._latest = np.full((64, len(metrics)), np.nan, dtype=np.float64)
+        self._updated = np.zeros(64, dtype=np.int64)   # row -> seq of its last record()
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def zone(self, name):
+        return self._zones.get(name)
+
+    def zones(self):
+        return list(self._zones)
+
+    def zones_by_row(self):
+        """Zone names in latest_matrix() row order (append-only; do not modify)."""
+        return self._names
+
+    def record(self, zone, ts, reading):
+        """Appends a reading dict for zone; missing metrics are stored as NaN."""
+        return self._store(zone, ts, reading, upsert=False)
+
+    def upsert(self, zone, ts, reading):
+        """record(), but replacing the zone's newest entry if it has the same ts (see ZoneHistory.upsert)."""
+        return self._store(zone, ts, reading, upsert=True)
+
+    def _store(self, zone, ts, reading, upsert):
+        history = self._zones.get(zone)
+        if history is None:
+            with self._lock:
+                history = self._zones.get(zone)
+                if history is None:
+                    if len(self._zones) >= self.max_zones:
+                        return False
+                    history = self._add_zone(zone)
+        row = [reading.get(name, np.nan) for name in self.metrics]
+        if upsert:
+            if not history.upsert(ts, row):
+                return False
+        else:
+            history.append(ts, row)
+        i = self._rows[zone]
+        self._latest[i] = row
+        # Stamp the row before publishing the new seq, so a reader that sees
+        # seq k also sees every row stamped <= k
+        seq = self.seq + 1
+        self._updated[i] = seq
+        self.seq = seq
+        return True
+
+    def _add_zone(self, zone):
+        # Called with the lock held. Grows the latest matrix by doubling; readers
+        # holding the old matrix keep a consistent (if slightly stale) copy.
+        i = len(self._names)
+        if i == len(self._latest):
+            grown = np.full((2 * i, len(self.metrics)), np.nan, dtype=np.float64)
+            grown[:i] = self._latest
+            updated = np.zeros(2 * i, dtype=np.int64)
+            updated[:i] = self._updated
+            self._latest, self._updated = grown, updated
+        self._rows[zone] = i
+        self._names.append(zone)
+        history = self._zones[zone] = ZoneHistory(self.capacity, self.metrics)
+        return history
+
+    def latest_matrix(self, metrics=None):
+        """
+        (names, values) for every zone: names is the append-only zone list and
+        values a [len(names) x len(metrics)] array of latest readings (a view of
+        live storage — copy if it must outlive the current tick).
+        """
+        names = self._names
+        n = len(names)
+        values = self._latest[:n]
+        if metrics is not None:
+            values = values[:, [self.metric_index[m] for m in metrics]]
+        return names, values
+
+    def changed_since(self, seq):
+        """(rows of latest_matrix() recorded after seq, current seq) — for incremental consumers."""
+        current = self.seq
+        n = len(self._names)
+        return np.flatnonzero(self._updated[:n] > seq), current
+
+    def latest(self):
+        """Latest reading of every zone, keyed by zone name."""
+        return {name: history.last() for name, history in list(self._zones.items())}
+
+    def memory_bytes(self):
+        per_zone = self.capacity * (8 + 4 * len(self.metrics))
+        return per_zone * len(self._zones)
@@ -15,6 +15,10 @@ export function useRealtimeData(interval = 3000) {
   const [weeklyForecast] = useState(getWeeklyForecast());
   const recommendations = getRecommendations();
   const intervalRef = useRef<number>();
+  // Chart bucket of the newest point, in units of `interval` of server time
+  const lastBucketRef = useRef(-Infinity);
+  // Alerts the user dismissed; they stay hidden until their feeder recovers
+  const dismissedRef = useRef(new Set<string>());
 
   const runOptimization = useCallback(() => {
     setIsOptimizing(true);
@@ -22,57 +26,54 @@ export function useRealtimeData(interval = 3000) {
   }, []);
 
   const removeAlert = useCallback((id: string) => {
+    dismissedRef.current.add(id);
     setAlerts(prev => prev.filter(alert => alert.id !== id));
   }, []);
 
-  const update = useCallback(async () => {
-    try {
-      // Fetch data from real backend
-      const [live, prediction, risk, sustainability, backendAlerts, mapData, theft] = await Promise.all([
-        api.fetchLiveData(),
-        api.fetchPredictions(),
-        api.fetchRiskData(),
-        api.fetchSustainability(),
-        api.fetchAlerts(),
-        api.fetchMapData(),
-        api.fetchTheftData(),
-      ]);
-
-      if (live && !live.error) {
-        let finalMetrics = {
-          householdLoad: live.household_load / 10,
-          solarGeneration: live.solar_generation / 10,
-          gridLoad: live.grid_load,
-          peakDemand: 95,
-          efficiency: 92,
-          renewablePercent: sustainability.renewable_percentage || 0,
-          co2Saved: sustainability.co2_saved || 0,
-          riskScore: risk.risk_score || 0,
-          theftProbability: theft.theft_risk === 'HIGH' ? 85 : theft.theft_risk === 'MEDIUM' ? 45 : 12,
-          confidencePercent: 94,
-          overloadProbability: risk.risk_level === 'HIGH' ? 82 : 15,
-          blackoutRisk: risk.risk_level === 'HIGH' ? 45 : 5,
-          currentCost: 24.5,
-          estimatedMonthlyCost: 850,
-        };
+  const applyBundle = useCallback((bundle: any) => {
+    const { live, predictions: prediction, risk, sustainability, alerts: backendAlerts, map: mapData, theft } = bundle;
 
-        if (isOptimizing) {
-          finalMetrics = {
-            ...finalMetrics,
-            riskScore: finalMetrics.riskScore * 0.4,
-            overloadProbability: finalMetrics.overloadProbability * 0.3,
-            blackoutRisk: finalMetrics.blackoutRisk * 0.2,
-            efficiency: Math.min(99, finalMetrics.efficiency * 1.2),
-            renewablePercent: Math.min(100, finalMetrics.renewablePercent * 1.15),
-            confidencePercent: Math.min(100, finalMetrics.confidencePercent * 1.1),
-          };
-        }
+    if (live && !live.error) {
+      let finalMetrics = {
+        householdLoad: live.household_load / 10,
+        solarGeneration: live.solar_generation / 10,
+        gridLoad: live.grid_load,
+        peakDemand: 95,
+        efficiency: 92,
+        renewablePercent: sustainability.renewable_percentage || 0,
+        co2Saved: sustainability.co2_saved || 0,
+        riskScore: risk.risk_score || 0,
+        theftProbability: theft.theft_risk === 'HIGH' ? 85 : theft.theft_risk === 'MEDIUM' ? 45 : 12,
+        confidencePercent: 94,
+        overloadProbability: risk.risk_level === 'HIGH' ? 82 : 15,
+        blackoutRisk: risk.risk_level === 'HIGH' ? 45 : 5,
+        currentCost: 24.5,
+        estimatedMonthlyCost: 850,
+      };
+
+      if (isOptimizing) {
+        finalMetrics = {
+          ...finalMetrics,
+          riskScore: finalMetrics.riskScore * 0.4,
+          overloadProbability: finalMetrics.overloadProbability * 0.3,
+          blackoutRisk: finalMetrics.blackoutRisk * 0.2,
+          efficiency: Math.min(99, finalMetrics.efficiency * 1.2),
+          renewablePercent: Math.min(100, finalMetrics.renewablePercent * 1.15),
+          confidencePercent: Math.min(100, finalMetrics.confidencePercent * 1.1),
+        };
+      }
 
-        setMetrics(finalMetrics);
+      setMetrics(finalMetrics);
 
+      // One chart point per `interval` of server time (the frame's source_ts):
+      // frames within the same interval update its point, and frames older
+      // than the newest point are dropped
+      const bucket = Math.floor(((bundle.source_ts ?? Date.now() / 1000) * 1000) / interval);
+      if (bucket >= lastBucketRef.current) {
+        const sameBucket = bucket === lastBucketRef.current;
+        lastBucketRef.current = bucket;
         setTimeSeries(prev => {
-          const next = [...prev.slice(1)];
-          const now = new Date();
+          const next = sameBucket ? prev.slice(0, -1) : prev.slice(1);
           let actual = live.grid_load;
           let predicted = prediction.predicted_load || live.grid_load + 5;
 
@@ -81,7 +82,7 @@ export function useRealtimeData(interval = 3000) {
           }
 
           next.push({
-            time: now.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' }),
+            time: new Date(bucket * interval).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' }),
             actual,
             predicted,
             solar: live.solar_generation / 10,
@@ -90,42 +91,135 @@ export function useRealtimeData(interval = 3000) {
           });
           return next;
         });
+      }
 
-        if (backendAlerts && backendAlerts.alerts) {
-          const newAlerts: Alert[] = backendAlerts.alerts.map((msg: string) => ({
-            id: Math.random().toString(36).slice(2, 9),
+      // Alerts are keyed by feeder and kind, so a feeder that stays at risk
+      // keeps one alert (and the time it was raised) across frames. Full
+      // frames list every feeder, delta frames only those that changed; a
+      // listed feeder's previous alerts are replaced by its current one.
+      const feeders: any[] | undefined = risk?.feeders;
+      if (feeders) {
+        const raised: Alert[] = feeders
+          .filter(f => f.risk_level === 'HIGH' || f.risk_level === 'MEDIUM')
+          .map((f): Alert => {
+            const high = f.risk_level === 'HIGH';
+            return {
+              id: `${f.feeder}:${high ? 'overload' : 'warning'}`,
+              type: high ? 'overload' : 'warning',
+              title: 'System Alert',
+              message: `${high ? '🚨 High overload risk detected' : '⚠️ Moderate load risk'}: ${f.feeder} at ${Math.round(f.utilisation * 100)}% of capacity`,
+              severity: high ? 'high' : 'medium',
+              timestamp: new Date(),
+            };
+          });
+        const raisedIds = new Set(raised.map(a => a.id));
+        const listed = new Set<string>(feeders.flatMap(f => [`${f.feeder}:overload`, `${f.feeder}:warning`]));
+        listed.forEach(id => {
+          if (!raisedIds.has(id)) dismissedRef.current.delete(id);
+        });
+        setAlerts(prev => {
+          const raisedAt = new Map(prev.map(a => [a.id, a.timestamp]));
+          const current = raised
+            .filter(a => !dismissedRef.current.has(a.id))
+            .map(a => ({ ...a, timestamp: raisedAt.get(a.id) ?? a.timestamp }));
+          return [...current, ...prev.filter(a => !listed.has(a.id))].slice(0, 8);
+        });
+      } else if (backendAlerts?.alerts?.length) {
+        const messages: string[] = backendAlerts.alerts;
+        setAlerts(prev => [
+          ...messages.map((msg): Alert => ({
+            id: msg,
             type: msg.includes('High') ? 'overload' : 'warning',
             title: 'System Alert',
             message: msg,
             severity: msg.includes('High') ? 'high' : 'medium',
             timestamp: new Date(),
-          }));
-          if (newAlerts.length > 0) {
-            setAlerts(prev => [...newAlerts, ...prev].slice(0, 8));
-          }
-        }
+          })),
+          ...prev.filter(a => !messages.includes(a.id)),
+        ].slice(0, 8));
+      }
 
-        if (mapData) {
-          setZones(mapData.map((z: any) => ({
-            id: z.zone,
-            name: z.zone,
-            lat: z.lat,
-            lng: z.lon,
-            load: z.load,
-            status: z.risk === 'HIGH' ? 'danger' : z.risk === 'MEDIUM' ? 'medium' : 'safe',
-            theftRisk: z.theft_risk === 'HIGH',
-            faults: z.risk === 'HIGH' ? 2 : 0,
-          })));
+      if (mapData) {
+        const changed: Zone[] = mapData.map((z: any) => ({
+          id: z.zone,
+          name: z.zone,
+          lat: z.lat,
+          lng: z.lon,
+          load: z.load,
+          status: z.risk === 'HIGH' ? 'danger' : z.risk === 'MEDIUM' ? 'medium' : 'safe',
+          theftRisk: z.theft_risk === 'HIGH',
+          faults: z.risk === 'HIGH' ? 2 : 0,
+        }));
+        if (bundle.delta) {
+          // Live delta frame: only the zones that changed since the last frame
+          if (changed.length > 0) {
+            setZones(prev => {
+              const byId = new Map(prev.map(z => [z.id, z]));
+              changed.forEach(z => byId.set(z.id, z));
+              return Array.from(byId.values());
+            });
+          }
+        } else {
+          setZones(changed);
         }
-      } else {
-        // Fallback to mock update if backend doesn't have data yet
-        runMockUpdate();
       }
+    } else {
+      // Fallback to mock update if backend doesn't have data yet
+      runMockUpdate();
+    }
+  }, [isOptimizing, interval]);
+
+  const update = useCallback(async () => {
+    try {
+      // Polling fallback — only used while no live stream is delivering frames
+      const bundle = await api.fetchDashboard();
+      if (bundle) applyBundle(bundle);
     } catch (error) {
       console.error('Failed to fetch from backend, using mock data:', error);
       runMockUpdate();
     }
-  }, [isOptimizing]);
+  }, [applyBundle]);
+
+  // Keep the stream handlers pointed at the latest applyBundle without reconnecting
+  const applyBundleRef = useRef(applyBundle);
+  applyBundleRef.current = applyBundle;
+  const streamLiveRef = useRef(false);
+
+  useEffect(() => {
+    let stream: WebSocket | EventSource | null = null;
+    let retryTimer: number | undefined;
+    let closed = false;
+    // /ws/live first; a connection that closes before its first frame (e.g. a
+    // proxy that blocks WebSockets) switches to /sse/live and back. Polling
+    // runs only while neither delivers frames.
+    let useEvents = false;
+
+    const connect = () => {
+      let received = false;
+      const onFrame = (frame: any) => {
+        received = true;
+        streamLiveRef.current = true;
+        applyBundleRef.current(frame);
+      };
+      const onClose = () => {
+        streamLiveRef.current = false;
+        if (!received) useEvents = !useEvents;
+        if (!closed) retryTimer = window.setTimeout(connect, 5000);
+      };
+      stream = useEvents ? api.openLiveEvents(onFrame, onClose) : api.openLiveSocket(onFrame, onClose);
+      if (!stream && !useEvents) {
+        useEvents = true;
+        stream = api.openLiveEvents(onFrame, onClose);
+      }
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      stream?.close();
+    };
+  }, []);
 
   const runMockUpdate = useCallback(() => {
     let newMetrics = generateMetrics();
@@ -187,7 +281,9 @@ export function useRealtimeData(interval = 3000) {
       }
     };
 
-    intervalRef.current = window.setInterval(update, interval);
+    intervalRef.current = window.setInterval(() => {
+      if (!streamLiveRef.current) update();
+    }, interval);
     fetchWeather();
     const weatherInterval = window.setInterval(fetchWeather, 30000);
     
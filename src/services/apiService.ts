@@ -4,6 +4,64 @@ const API_BASE_URL =
   import.meta.env.VITE_API_BASE_URL ||
   (import.meta.env.PROD ? '' : 'http://localhost:8005');
 
+/**
+ * Opens the backend's live push channel. Each frame bundles live data, predictions,
+ * risk, sustainability, alerts, map and theft for one stream tick, replacing the
+ * seven per-interval polls. Returns null when WebSockets are unavailable.
+ */
+export function openLiveSocket(onFrame: (frame: any) => void, onClose: () => void): WebSocket | null {
+  if (typeof WebSocket === 'undefined') return null;
+  const base = API_BASE_URL || window.location.origin;
+  const socket = new WebSocket(`${base.replace(/^http/, 'ws')}/ws/live`);
+  socket.onmessage = (event) => {
+    try {
+      onFrame(JSON.parse(event.data));
+    } catch (e) {
+      console.error('Bad live frame:', e);
+    }
+  };
+  socket.onclose = onClose;
+  socket.onerror = () => socket.close();
+  return socket;
+}
+
+/**
+ * Opens the /sse/live stream (same frames as /ws/live) for networks that
+ * block WebSockets. Returns null when EventSource is unavailable.
+ */
+export function openLiveEvents(onFrame: (frame: any) => void, onClose: () => void): EventSource | null {
+  if (typeof EventSource === 'undefined') return null;
+  const events = new EventSource(`${API_BASE_URL}/sse/live`);
+  events.onmessage = (event) => {
+    try {
+      onFrame(JSON.parse(event.data));
+    } catch (e) {
+      console.error('Bad live frame:', e);
+    }
+  };
+  // Reconnect ourselves: the stream must restart with a whole payload
+  events.onerror = () => {
+    events.close();
+    onClose();
+  };
+  return events;
+}
+
+let dashboardEtag: string | null = null;
+
+/**
+ * Fetches the precomputed dashboard payload (same shape as a /ws/live frame).
+ * Resolves to null when nothing changed since the previous call (HTTP 304).
+ */
+export async function fetchDashboard() {
+  const response = await fetch(`${API_BASE_URL}/dashboard`, {
+    headers: dashboardEtag ? { 'If-None-Match': dashboardEtag } : {},
+  });
+  if (response.status === 304) return null;
+  dashboardEtag = response.headers.get('ETag');
+  return response.json();
+}
+
 export async function fetchMapData() {
   const response = await fetch(`${API_BASE_URL}/map`);
   return response.json();